@@ -1,28 +1,37 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
 from chatbot_core import Chatbot
 from config import Config
+from response_format import compress, encode, negotiate, shape, shape_options
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
-# Initialize chatbot
+# Initialize chatbot once per process. With WARMUP_ON_START the database
+# connection and schema load happen in the background at startup; otherwise
+# the first request that needs them pays the cost, behind a lock.
 chatbot = Chatbot()
+if Config.WARMUP_ON_START:
+    chatbot.start_warmup()
 
-# --- Compatibility patch ---
-# Flask 3.x removed before_first_request, so we use getattr to handle both
-if hasattr(app, 'before_first_request'):
-    decorator = app.before_first_request
-else:
-    decorator = app.before_request
-# --------------------------------
-
-@decorator
-def initialize_chatbot():
-    """Initialize chatbot before first request (Flask 2.x) or at startup (Flask 3.x fallback)"""
-    if not chatbot.initialize():
-        print("⚠️ WARNING: Failed to initialize chatbot")
-    else:
-        print("🤖 Chatbot initialized successfully")
+def _session_id(data):
+    """The conversation a message belongs to: the request's ``session_id``,
+    else None (the message is answered on its own)"""
+    if data.get('session_id'):
+        return str(data['session_id'])
+    return None
+
+def _respond(payload, status=200):
+    """Encode ``payload`` as negotiated by the Accept (JSON or msgpack) and
+    Accept-Encoding (brotli or gzip) headers"""
+    media_type, encoding = negotiate(request.headers.get('Accept'),
+                                     request.headers.get('Accept-Encoding'))
+    body = encode(payload, media_type, app.json.dumps)
+    body, applied = compress(body, encoding, Config.COMPRESS_MIN_BYTES)
+    response = Response(body, status=status, mimetype=media_type)
+    if applied:
+        response.headers['Content-Encoding'] = applied
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    return response
 
 @app.route('/')
 def home():
@@ -31,7 +40,11 @@ def home():
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
-    """Handle chat messages"""
+    """Handle chat messages.
+
+    ``format`` ('rows' or 'columnar') shapes the result data; the debug
+    block is included only with ``debug`` (or ``timings``) set.
+    """
     try:
         data = request.get_json()
         user_message = data.get('message', '')
@@ -42,8 +55,16 @@ def chat():
                 'message': 'No message provided'
             }), 400
         
-        response = chatbot.process_message(user_message)
-        return jsonify(response)
+        response = chatbot.process_message(
+            user_message,
+            page_size=data.get('page_size'),
+            cursor=data.get('cursor'),
+            include_timings=bool(data.get('timings')),
+            count_accuracy=data.get('count_accuracy'),
+            timeout=data.get('timeout'),
+            session_id=_session_id(data)
+        )
+        return _respond(shape(response, *shape_options(data, Config.RESPONSE_FORMAT)))
     
     except Exception as e:
         return jsonify({
@@ -51,6 +72,57 @@ def chat():
             'message': f'Server error: {str(e)}'
         }), 500
 
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """Answer a list of messages in one round trip"""
+    try:
+        data = request.get_json(silent=True) or {}
+        messages = data.get('messages')
+
+        if not isinstance(messages, list) or not messages:
+            return jsonify({
+                'success': False,
+                'message': 'No messages provided'
+            }), 400
+        if len(messages) > Config.BATCH_MAX_SIZE:
+            return jsonify({
+                'success': False,
+                'message': f'At most {Config.BATCH_MAX_SIZE} messages per batch'
+            }), 400
+
+        results = chatbot.process_messages([str(m) for m in messages],
+                                           timeout=data.get('timeout'))
+        data_format, debug = shape_options(data, Config.RESPONSE_FORMAT)
+        return _respond({'success': True,
+                         'results': [shape(r, data_format, debug) for r in results]})
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Server error: {str(e)}'
+        }), 500
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Stream a chat answer as NDJSON: a header line, one line per row,
+    then a trailer line with "done": true and the row count"""
+    data = request.get_json(silent=True) or {}
+    user_message = data.get('message', '')
+
+    if not user_message:
+        return jsonify({
+            'success': False,
+            'message': 'No message provided'
+        }), 400
+
+    def generate():
+        debug = shape_options(data)[1]
+        for record in chatbot.stream_message(user_message, data.get('batch_size'),
+                                             data.get('timeout'), debug):
+            yield app.json.dumps(record) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/tables', methods=['GET'])
 def get_tables():
     """Get list of available tables"""
@@ -62,11 +134,26 @@ def get_tables():
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Liveness endpoint: the process is up and serving HTTP"""
     return jsonify({
         'status': 'healthy',
         'database_connected': chatbot.is_connected
     })
 
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint: the chatbot is initialized and can answer"""
+    ready = chatbot.is_ready
+    return jsonify({
+        'ready': ready,
+        'state': chatbot.state
+    }), 200 if ready else 503
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Latency histograms, pool and cache gauges in Prometheus text format"""
+    return Response(chatbot.metrics.render(),
+                    mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=Config.DEBUG)
@@ -0,0 +1,364 @@
+"""ASGI serving mode: one event loop holds every request in flight.
+
+    uvicorn asgi:application --workers 1
+
+A chat request waiting on MySQL is a suspended coroutine, not a blocked
+worker thread. The CPU-bound half of a message (tokenizing, intent and
+entity matching, SQL generation) runs on a small thread pool. The half that
+talks to the database (the EXPLAIN guard, the query, and the connect and
+schema load at startup) runs on a pool sized to the connection pool, as
+more threads could only wait for a connection. So one process serves as many
+concurrent chats as Config.ASYNC_MAX_PENDING allows.
+
+The chat endpoints are served natively. Every other route (the page,
+tables, health, readiness, metrics) is passed to the Flask app in app.py.
+"""
+import asyncio
+import io
+import itertools
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import app as flask_app
+from config import Config
+from response_format import compress, encode, negotiate, shape, shape_options
+
+# Rows handed from the streaming cursor to the event loop per executor hop
+_STREAM_CHUNK = 200
+
+
+class AsyncChatbot:
+    """Async front of a Chatbot, bridging to it through bounded executors.
+
+    ``cpu_workers`` threads plan messages and ``db_workers`` threads run
+    their queries. At most ``max_pending`` requests are admitted at once;
+    beyond that ``admit`` refuses, so an overload is answered quickly
+    instead of queueing without bound.
+    """
+
+    def __init__(self, chatbot, cpu_workers=4, db_workers=5, max_pending=10000):
+        self.chatbot = chatbot
+        self.max_pending = max_pending
+        self.pending = 0
+        self._cpu = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix='chat-cpu')
+        self._db = ThreadPoolExecutor(max_workers=db_workers, thread_name_prefix='chat-db')
+
+    def admit(self):
+        """Take a request slot; False when ``max_pending`` are in flight"""
+        if self.pending >= self.max_pending:
+            return False
+        self.pending += 1
+        return True
+
+    def release(self):
+        self.pending -= 1
+
+    async def run_cpu(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._cpu, func, *args)
+
+    async def run_db(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._db, func, *args)
+
+    async def initialize(self):
+        """Connect and load the schema on the database pool (waiting for a
+        warm-up in flight), so planning never does it on the CPU pool"""
+        if self.chatbot.is_ready:
+            return True
+        return await self.run_db(self.chatbot.ensure_initialized)
+
+    async def process_message(self, user_message, page_size=None, cursor=None,
+                              include_timings=False, count_accuracy=None, timeout=None,
+                              session_id=None, deadline=None):
+        """Chatbot.process_message, with planning on the CPU pool and the
+        EXPLAIN guard and query on the database pool"""
+        chatbot = self.chatbot
+        deadline = deadline or chatbot.request_deadline(timeout)
+        timings = {}
+        with chatbot.metrics.timer('chatbot_stage_seconds', timings, stage='total'):
+            await self.initialize()
+            response, job = await self.run_cpu(
+                chatbot.prepare_message, user_message, page_size, cursor, timings,
+                count_accuracy, deadline, session_id)
+            if job is not None:
+                response = await self.run_db(chatbot.run_job, job, timings, deadline)
+        return chatbot.record_response(response, timings if include_timings else None)
+
+    async def process_messages(self, messages, timeout=None):
+        """Answer a batch concurrently under one deadline, each distinct
+        message once; responses come back in input order"""
+        deadline = self.chatbot.request_deadline(timeout)
+        unique = list(dict.fromkeys(messages))
+        answers = await asyncio.gather(*(self.process_message(m, deadline=deadline)
+                                         for m in unique))
+        answered = dict(zip(unique, answers))
+        return [answered[m] for m in messages]
+
+    async def stream_message(self, user_message, batch_size=None, timeout=None, debug=False):
+        """Chatbot.stream_message, pulled a chunk of records per hop"""
+        records = self.chatbot.stream_message(user_message, batch_size, timeout, debug)
+        try:
+            while True:
+                chunk = await self.run_db(list, itertools.islice(records, _STREAM_CHUNK))
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            # Releases the streaming cursor's connection if the client left early
+            await self.run_db(records.close)
+
+    def close(self):
+        self._cpu.shutdown(wait=False)
+        self._db.shutdown(wait=False)
+        self.chatbot.close()
+
+
+def _headers(scope):
+    """Request headers as a dict of lowercase names"""
+    headers = {}
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').lower()
+        value = value.decode('latin-1')
+        headers[name] = f"{headers[name]}, {value}" if name in headers else value
+    return headers
+
+
+async def _read_body(receive):
+    body = b''
+    more = True
+    while more:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body += message.get('body', b'')
+        more = message.get('more_body', False)
+    return body
+
+
+async def _send(send, status, body, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(k.encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class ChatApplication:
+    """The ASGI application: chat endpoints on the AsyncChatbot, the rest
+    on ``wsgi_app`` (run on the CPU pool, response buffered)"""
+
+    def __init__(self, bridge, wsgi_app):
+        self.bridge = bridge
+        self.wsgi_app = wsgi_app
+        self.routes = {
+            '/api/chat': self.chat,
+            '/api/chat/batch': self.chat_batch,
+            '/api/chat/stream': self.chat_stream
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        handler = self.routes.get(scope['path']) if scope['method'] == 'POST' else None
+        body = await _read_body(receive)
+        if handler is None:
+            await self._wsgi(scope, body, send)
+            return
+        if not self.bridge.admit():
+            await self._respond(scope, send, {
+                'success': False,
+                'message': 'Server busy, try again shortly'
+            }, status=503)
+            return
+        try:
+            try:
+                data = json.loads(body or b'{}')
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                await self._respond(scope, send, {
+                    'success': False,
+                    'message': 'Request body must be a JSON object'
+                }, status=400)
+                return
+            await handler(scope, data, send)
+        except Exception as e:
+            await self._respond(scope, send, {
+                'success': False,
+                'message': f'Server error: {str(e)}'
+            }, status=500)
+        finally:
+            self.bridge.release()
+
+    async def chat(self, scope, data, send):
+        """Handle chat messages (see app.chat)"""
+        user_message = data.get('message', '')
+        if not user_message:
+            await self._respond(scope, send, {
+                'success': False,
+                'message': 'No message provided'
+            }, status=400)
+            return
+
+        session_id = self._session_id(data)
+        response = await self.bridge.process_message(
+            user_message,
+            page_size=data.get('page_size'),
+            cursor=data.get('cursor'),
+            include_timings=bool(data.get('timings')),
+            count_accuracy=data.get('count_accuracy'),
+            timeout=data.get('timeout'),
+            session_id=session_id
+        )
+        await self._respond(scope, send,
+                            shape(response, *shape_options(data, Config.RESPONSE_FORMAT)))
+
+    async def chat_batch(self, scope, data, send):
+        """Answer a list of messages in one round trip (see app.chat_batch)"""
+        messages = data.get('messages')
+        if not isinstance(messages, list) or not messages:
+            await self._respond(scope, send, {
+                'success': False,
+                'message': 'No messages provided'
+            }, status=400)
+            return
+        if len(messages) > Config.BATCH_MAX_SIZE:
+            await self._respond(scope, send, {
+                'success': False,
+                'message': f'At most {Config.BATCH_MAX_SIZE} messages per batch'
+            }, status=400)
+            return
+
+        results = await self.bridge.process_messages([str(m) for m in messages],
+                                                     timeout=data.get('timeout'))
+        data_format, debug = shape_options(data, Config.RESPONSE_FORMAT)
+        await self._respond(scope, send, {
+            'success': True,
+            'results': [shape(r, data_format, debug) for r in results]
+        })
+
+    async def chat_stream(self, scope, data, send):
+        """Stream a chat answer as NDJSON (see app.chat_stream)"""
+        user_message = data.get('message', '')
+        if not user_message:
+            await self._respond(scope, send, {
+                'success': False,
+                'message': 'No message provided'
+            }, status=400)
+            return
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'application/x-ndjson')]
+        })
+        dumps = flask_app.app.json.dumps
+        async for chunk in self.bridge.stream_message(user_message, data.get('batch_size'),
+                                                      data.get('timeout'),
+                                                      shape_options(data)[1]):
+            lines = ''.join(dumps(record) + '\n' for record in chunk)
+            await send({'type': 'http.response.body', 'body': lines.encode('utf-8'),
+                        'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    @staticmethod
+    def _session_id(data):
+        """The body's ``session_id``, else None (see app._session_id)"""
+        if data.get('session_id'):
+            return str(data['session_id'])
+        return None
+
+    async def _respond(self, scope, send, payload, status=200, headers=()):
+        """Send ``payload`` encoded as negotiated (see app._respond), the
+        encoding done on the CPU pool"""
+        request_headers = _headers(scope)
+        media_type, encoding = negotiate(request_headers.get('accept'),
+                                         request_headers.get('accept-encoding'))
+
+        def build():
+            body = encode(payload, media_type, flask_app.app.json.dumps)
+            return compress(body, encoding, Config.COMPRESS_MIN_BYTES)
+
+        body, applied = await self.bridge.run_cpu(build)
+        headers = [('Content-Type', media_type), ('Vary', 'Accept, Accept-Encoding'),
+                   ('Content-Length', str(len(body)))] + list(headers)
+        if applied:
+            headers.append(('Content-Encoding', applied))
+        await _send(send, status, body, headers)
+
+    async def _wsgi(self, scope, body, send):
+        """Serve a request with the WSGI app"""
+        environ = self._environ(scope, body)
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = headers
+
+        def call():
+            result = self.wsgi_app(environ, start_response)
+            try:
+                return b''.join(result)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+
+        response_body = await self.bridge.run_cpu(call)
+        await _send(send, started['status'], response_body, started['headers'])
+
+    @staticmethod
+    def _environ(scope, body):
+        """WSGI environ of an ASGI HTTP request"""
+        server = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False
+        }
+        for name, value in _headers(scope).items():
+            if name == 'content-type':
+                environ['CONTENT_TYPE'] = value
+            elif name == 'content-length':
+                environ['CONTENT_LENGTH'] = value
+            else:
+                environ[f"HTTP_{name.upper().replace('-', '_')}"] = value
+        return environ
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Serve only once the schema is loaded; a failed start is
+                # retried per request and reported by /api/ready
+                await self.bridge.initialize()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.bridge.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+application = ChatApplication(
+    AsyncChatbot(flask_app.chatbot,
+                 cpu_workers=Config.ASYNC_CPU_WORKERS,
+                 db_workers=Config.ASYNC_DB_WORKERS,
+                 max_pending=Config.ASYNC_MAX_PENDING),
+    flask_app.app
+)
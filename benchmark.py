@@ -0,0 +1,219 @@
+"""Per-stage microbenchmarks for the chatbot pipeline.
+
+Runs against FakeDatabaseManager, so no MySQL server is needed:
+
+    python benchmark.py --sizes 50 500 --widths 0 100 500 --output bench.json
+    python benchmark.py --compare bench.json      # rerun and diff against it
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+
+from config import Config
+from chatbot_core import Chatbot
+from fake_database import CATEGORIES, DEPARTMENTS, FIRST_NAMES, LAST_NAMES, FakeDatabaseManager
+
+QUESTION_TEMPLATES = [
+    "Show me all {table}",
+    "List all {table}",
+    "How many {table}",
+    "How many {table} are there",
+    "Show {table} with {num_col} over {number}",
+    "List {table} with {num_col} less than {number}",
+    "{table} where {text_col} is {value}",
+    "What is the {num_col} of {name}",
+    "count {table} where {text_col} is {value}",
+    "get {table} with {num_col} greater than {number}",
+]
+
+FIXTURE_COLUMNS = {
+    'employees': ('salary', 'department', DEPARTMENTS),
+    'products': ('price', 'category', CATEGORIES),
+    'orders': ('total_amount', 'status', ['pending', 'shipped', 'delivered']),
+}
+
+# Values of each table's ``name`` column, for "What is the ... of <name>";
+# tables without one (orders) never get that question
+FIXTURE_NAMES = {
+    'employees': lambda rng: f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+    'products': lambda rng: f'product {rng.randint(1, 200)}',
+}
+
+
+def build_corpus(size, seed=7):
+    """``size`` realistic questions over the fixture tables"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        table = rng.choice(list(FIXTURE_COLUMNS))
+        num_col, text_col, values = FIXTURE_COLUMNS[table]
+        templates = [t for t in QUESTION_TEMPLATES
+                     if table in FIXTURE_NAMES or '{name}' not in t]
+        corpus.append(rng.choice(templates).format(
+            table=table,
+            num_col=num_col,
+            text_col=text_col,
+            value=rng.choice(values),
+            number=rng.choice([10, 50, 100, 500, 1000, 50000]),
+            name=FIXTURE_NAMES[table](rng) if table in FIXTURE_NAMES else '',
+        ))
+    return corpus
+
+
+def summarize(samples):
+    """Latency statistics in microseconds"""
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1e6
+
+    total = sum(ordered)
+    return {
+        'n': len(ordered),
+        'mean_us': round(statistics.fmean(ordered) * 1e6, 2),
+        'p50_us': round(pct(0.50), 2),
+        'p95_us': round(pct(0.95), 2),
+        'p99_us': round(pct(0.99), 2),
+        'ops_per_sec': round(len(ordered) / total, 1) if total else None,
+    }
+
+
+def _time_each(func, items, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        for item in items:
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func(item)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _clear_caches(chatbot):
+    """Drop every memoized result so a run measures the uncached path"""
+    chatbot.plan_cache.clear()
+    if chatbot.result_cache is not None:
+        chatbot.result_cache.clear()
+    matcher = chatbot.pattern_matcher
+    matcher.intent_engine.analyze.cache_clear()
+    matcher.table_index.clear_cache()
+    matcher.column_index.clear_cache()
+    for index in matcher.column_indexes.values():
+        index.clear_cache()
+
+
+def bench_schema(width, columns, corpus_sizes, repeat):
+    """Time every stage for one schema width across the corpus sizes"""
+    db = FakeDatabaseManager(width=width, columns=columns)
+    chatbot = Chatbot(db=db)
+    start = time.perf_counter()
+    if not chatbot.initialize():
+        raise RuntimeError("Failed to initialize chatbot against the fake database")
+    init_seconds = time.perf_counter() - start
+
+    preprocessor = chatbot.preprocessor
+    matcher = chatbot.pattern_matcher
+    generator = chatbot.query_generator
+
+    results = []
+    for size in corpus_sizes:
+        corpus = build_corpus(size)
+        keywords = {q: preprocessor.preprocess(q)['keywords'] for q in corpus}
+
+        def entities_for(q):
+            return matcher.extract_entities(q, keywords[q])
+
+        resolved = {q: (matcher.detect_intent(q), entities_for(q)) for q in corpus}
+
+        def reset():
+            _clear_caches(chatbot)
+
+        # (function, setup run untimed before each call)
+        stages = {
+            'preprocess': (preprocessor.preprocess, None),
+            'detect_intent': (matcher.detect_intent, reset),
+            'extract_entities': (entities_for, reset),
+            'generate_sql': (lambda q: generator.generate_sql(
+                resolved[q][0],
+                dict(resolved[q][1], columns=list(resolved[q][1]['columns'])), q), None),
+            'process_message_cold': (chatbot.process_message, reset),
+            'process_message_warm': (chatbot.process_message, None),
+        }
+        for stage, (func, setup) in stages.items():
+            stats = summarize(_time_each(func, corpus, repeat, setup))
+            results.append({'width': width, 'columns': columns, 'corpus_size': size,
+                            'stage': stage, **stats})
+            print(f"width={width:<5} corpus={size:<6} {stage:<22} "
+                  f"p50={stats['p50_us']:>10.1f}us  p99={stats['p99_us']:>10.1f}us")
+
+    chatbot.close()
+    return init_seconds, results
+
+
+def compare(baseline, current):
+    """Print the p50 change of every stage present in both runs"""
+    def key(r):
+        return r['width'], r['columns'], r['corpus_size'], r['stage']
+
+    before = {key(r): r for r in baseline['results']}
+    print("\nChange in p50 against baseline:")
+    for row in current['results']:
+        old = before.get(key(row))
+        if not old or not old['p50_us']:
+            continue
+        change = (row['p50_us'] - old['p50_us']) / old['p50_us'] * 100
+        print(f"width={row['width']:<5} corpus={row['corpus_size']:<6} {row['stage']:<22} "
+              f"{old['p50_us']:>10.1f}us -> {row['p50_us']:>10.1f}us ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 500],
+                        help='corpus sizes (questions per run)')
+    parser.add_argument('--widths', type=int, nargs='+', default=[0, 100, 500],
+                        help='number of extra synthetic tables')
+    parser.add_argument('--columns', type=int, default=12,
+                        help='columns per synthetic table')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='passes over each corpus')
+    parser.add_argument('--output', default='bench_results.json',
+                        help='where to save the JSON results')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='JSON results of an earlier run to diff against')
+    args = parser.parse_args()
+
+    # Keep fixture schemas out of the real schema snapshot
+    Config.SCHEMA_SNAPSHOT_PATH = ''
+
+    run = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+        },
+        'init_seconds': {},
+        'results': [],
+    }
+    for width in args.widths:
+        init_seconds, results = bench_schema(width, args.columns, args.sizes, args.repeat)
+        run['init_seconds'][str(width)] = round(init_seconds, 4)
+        run['results'].extend(results)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(run, f, indent=2)
+    print(f"\nSaved results to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), run)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,94 +1,345 @@
-from database import DatabaseManager
+import base64
+import copy
+import hashlib
+import json
+import re
+import threading
+import time
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+
+from database import DatabaseManager, QueryTimeoutError
+from deadline import Deadline
 from preprocessor import TextPreprocessor
 from pattern_matcher import PatternMatcher
 from query_generator import QueryGenerator
+from result_cache import ResultCache
+from plan_cache import PlanCache
+from row_counter import ACCURACY_LEVELS, RowCounter
+from conversation import ROW_INTENTS, ConversationStore, is_refinement
+from schema_watcher import SchemaWatcher
+from metrics import COUNT_BUCKETS, MetricsRegistry
+from config import Config
+
+# Characters clean_text drops that can still change a plan ('>', '.', quotes)
+_SIGNIFICANT_PUNCTUATION = re.compile(r'[^a-z0-9\s]')
+
+# Intents whose SQL already returns a handful of summary rows (or orders its
+# own rows), so keyset pagination does not apply
+_UNPAGED_INTENTS = frozenset({'count', 'aggregate', 'top_n'})
+
+# Intents whose answer a follow-up can narrow with another condition
+_REFINABLE_INTENTS = ROW_INTENTS | _UNPAGED_INTENTS
+# Entities a count/aggregate/top-N follow-up takes from its own text
+_SUMMARY_FIELDS = ('aggregate', 'aggregate_column', 'group_by', 'order_by',
+                   'order_direction', 'limit')
+
+_AGGREGATE_LABELS = {'SUM': 'total', 'AVG': 'average', 'MIN': 'minimum', 'MAX': 'maximum'}
+
+# Groups listed in a grouped summary before it is cut short
+_SUMMARY_GROUPS = 10
+
+
+def _row_count(value, default, maximum=None):
+    """A client-supplied page or batch size as an int of at least 1 (and at
+    most ``maximum``); ``default`` when it is missing or not a number"""
+    try:
+        size = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        size = default
+    if maximum is not None:
+        size = min(size, maximum)
+    return max(1, size)
+
+
+def _sql_digest(sql, params):
+    text = json.dumps([sql, params], default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def _encode_cursor(sql, params, after):
+    """Opaque page token: the last key seen, bound to the query it pages"""
+    payload = json.dumps({'q': _sql_digest(sql, params), 'k': after}, default=str)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(token, sql, params):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid page cursor")
+    if payload.get('q') != _sql_digest(sql, params):
+        raise ValueError("Page cursor does not belong to this question")
+    return payload.get('k')
 
 
 class Chatbot:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db=None):
+        self.db = db if db is not None else DatabaseManager()
         self.preprocessor = TextPreprocessor()
         self.pattern_matcher = None
         self.query_generator = None
         self.is_connected = False
+        self.result_cache = ResultCache(
+            max_bytes=Config.RESULT_CACHE_MAX_BYTES,
+            max_entries=Config.RESULT_CACHE_MAX_ENTRIES,
+            default_ttl=Config.RESULT_CACHE_TTL,
+            table_ttls=Config.RESULT_CACHE_TABLE_TTLS
+        ) if Config.RESULT_CACHE_ENABLED else None
+        self.plan_cache = PlanCache(Config.PLAN_CACHE_SIZE)
+        self.row_counter = RowCounter(
+            self.db,
+            ttl=Config.COUNT_CACHE_TTL,
+            hot_threshold=Config.COUNT_HOT_THRESHOLD,
+            refresh_interval=Config.COUNT_REFRESH_INTERVAL
+        )
+        self.conversations = ConversationStore(
+            max_sessions=Config.CONVERSATION_MAX_SESSIONS,
+            ttl=Config.CONVERSATION_TTL,
+            max_rows=Config.CONVERSATION_MAX_ROWS
+        )
+        self.metrics = MetricsRegistry()
+        self._register_gauges()
+        self.state = 'idle'
+        self._init_lock = threading.Lock()
+        self._last_init_attempt = None
+        self._warmup_thread = None
+        self.schema_watcher = None
+
+    @property
+    def is_ready(self):
+        """Whether the chatbot can answer questions without further setup"""
+        return self.state == 'ready'
 
-    def initialize(self):
-        """Initialize chatbot and connect to database"""
-        if self.db.connect():
-            self.pattern_matcher = PatternMatcher(self.db)
-            self.query_generator = QueryGenerator(self.pattern_matcher)
-            self.is_connected = True
+    def initialize(self, retry_after=None):
+        """Initialize chatbot and connect to database.
+
+        Safe to call from several threads: the connect-and-load-schema work
+        runs once, and callers arriving meanwhile wait for its outcome. With
+        ``retry_after`` no new attempt is made within that many seconds of
+        the last one, so callers queued behind a failed attempt give up
+        instead of each reconnecting in turn.
+        """
+        if self.is_connected:
             return True
-        return False
+        with self._init_lock:
+            if self.is_connected:
+                return True
+            if retry_after is not None and self._throttled(retry_after):
+                return False
+            self.state = 'initializing'
+            self._last_init_attempt = time.monotonic()
+            try:
+                if self.db.connect():
+                    self.pattern_matcher = PatternMatcher(self.db)
+                    self.query_generator = QueryGenerator(self.pattern_matcher)
+                    self.schema_watcher = SchemaWatcher(
+                        self.db, self.pattern_matcher,
+                        interval=Config.SCHEMA_WATCH_INTERVAL,
+                        on_change=self._schema_changed
+                    )
+                    self.schema_watcher.start()
+                    self.is_connected = True
+                    self.state = 'ready'
+                    return True
+            except Exception as e:
+                # A failed schema load must not leave the pool open or the
+                # state stuck in 'initializing' (which skips the retry throttle)
+                print(f"❌ Error initializing chatbot: {e}")
+                self.db.close()
+            self.state = 'failed'
+            return False
 
-    def process_message(self, user_message):
-        """Process user message and return response"""
+    def ensure_initialized(self):
+        """Initialize on first use, retrying a failed start at most every
+        Config.INIT_RETRY_INTERVAL seconds"""
+        if self.is_connected:
+            return True
+        # With a warm-up in flight this waits for it instead of starting another
+        if self.state != 'initializing' and self._throttled(Config.INIT_RETRY_INTERVAL):
+            return False
+        return self.initialize(retry_after=Config.INIT_RETRY_INTERVAL)
 
-        if not self.is_connected:
+    def _throttled(self, retry_after):
+        """Whether the last initialization attempt was under ``retry_after``
+        seconds ago"""
+        last = self._last_init_attempt
+        return last is not None and time.monotonic() - last < retry_after
+
+    def start_warmup(self):
+        """Initialize in a background thread so startup does not block"""
+        if self.is_connected or self._warmup_thread is not None:
+            return
+        self.state = 'initializing'
+        self._warmup_thread = threading.Thread(
+            target=self._warmup, name='chatbot-warmup', daemon=True
+        )
+        self._warmup_thread.start()
+
+    def _warmup(self):
+        # A request may have started the first attempt already
+        if self.initialize(retry_after=Config.INIT_RETRY_INTERVAL):
+            print("🤖 Chatbot initialized successfully")
+        else:
+            print("⚠️ WARNING: Failed to initialize chatbot")
+
+    def process_message(self, user_message, page_size=None, cursor=None,
+                        include_timings=False, count_accuracy=None, timeout=None,
+                        session_id=None):
+        """Process user message and return response.
+
+        With ``page_size`` (or a ``cursor`` from a previous page) row results
+        are fetched one page at a time with keyset pagination, and the
+        response carries a ``page`` block with the ``next_cursor`` token.
+        ``include_timings`` adds a per-stage breakdown (milliseconds) to the
+        debug block. ``count_accuracy`` ('exact', 'cached' or 'estimate')
+        overrides Config.COUNT_ACCURACY for unfiltered "how many" questions.
+
+        The whole request must finish within ``timeout`` seconds (at most
+        Config.REQUEST_TIMEOUT); database work past that is cancelled and
+        the response says the query timed out.
+
+        With a ``session_id`` the answer is remembered, and a follow-up such
+        as "only those in sales" narrows it: in memory when the previous
+        rows were kept, otherwise by adding the condition to its query.
+        """
+        timings = {}
+        deadline = self.request_deadline(timeout)
+        with self._stage('total', timings):
+            response = self._process_message(user_message, page_size, cursor, timings,
+                                             count_accuracy, deadline, session_id)
+        return self.record_response(response, timings if include_timings else None)
+
+    def record_response(self, response, timings=None):
+        """Count a finished answer and attach ``timings`` to its debug block"""
+        outcome = 'success' if response.get('success') else 'error'
+        self.metrics.inc('chatbot_requests_total', help_text='Chat messages processed',
+                         outcome=outcome)
+        if timings is not None and 'debug' in response:
+            response['debug']['timings_ms'] = timings
+        return response
+
+    def _process_message(self, user_message, page_size, cursor, timings,
+                         count_accuracy=None, deadline=None, session_id=None):
+        response, job = self.prepare_message(user_message, page_size, cursor, timings,
+                                             count_accuracy, deadline, session_id)
+        if job is None:
+            return response
+        return self.run_job(job, timings, deadline)
+
+    def prepare_message(self, user_message, page_size=None, cursor=None, timings=None,
+                        count_accuracy=None, deadline=None, session_id=None):
+        """Everything before the query runs: plan and bound it.
+
+        Returns ``(response, None)`` when the answer is already known (an
+        error, a follow-up answered in memory), otherwise ``(None, job)`` for
+        run_job. This is the CPU-bound half of process_message, run_job the
+        half that talks to the database (the EXPLAIN guard included), so the
+        async server can run them on separate executors.
+        """
+        if not self.ensure_initialized():
             return {
                 'success': False,
                 'message': 'Chatbot is not connected to database',
                 'data': None
-            }
+            }, None
 
         try:
-            # Step 1: Preprocess input
-            processed = self.preprocessor.preprocess(user_message)
-            keywords = processed['keywords']
-
-            # Step 2: Detect intent
-            intent = self.pattern_matcher.detect_intent(user_message)
+            # A follow-up narrowing the session's previous answer is resolved
+            # against that answer, filtering its rows in memory if kept
+            plan = None
+            conversation = self.conversations.get(session_id) if session_id else None
+            if conversation is not None and not cursor:
+                plan = self._refinement_plan(conversation, user_message, timings)
+            if plan is not None and not plan['error'] and plan['intent'] in ROW_INTENTS:
+                rows = conversation.filter_rows(*plan['entities']['filters'][-1])
+                if rows is not None:
+                    self.metrics.inc('chatbot_refinements_total',
+                                     help_text='Follow-ups narrowing a previous answer',
+                                     mode='in_memory')
+                    response = self._build_response(plan, rows, True, plan['sql'],
+                                                    plan['params'], timings)
+                    self._remember(session_id, plan, response)
+                    return response, None
+                self.metrics.inc('chatbot_refinements_total',
+                                 help_text='Follow-ups narrowing a previous answer',
+                                 mode='query')
 
-            # Step 3: Extract entities (improved)
-            entities = self.pattern_matcher.extract_entities(user_message, keywords)
+            # Steps 1-4: preprocess, detect intent, extract entities and
+            # generate SQL (memoized per normalized message)
+            if plan is None:
+                plan = self.plan_message(user_message, timings)
 
-            # Step 4: Generate SQL query
-            sql_query, error = self.query_generator.generate_sql(intent, entities, user_message)
-
-            if error:
+            if plan['error']:
                 return {
                     'success': False,
-                    'message': error,
+                    'message': plan['error'],
                     'data': None,
-                    'debug': {
-                        'intent': intent,
-                        'entities': entities,
-                        'keywords': keywords
-                    }
-                }
+                    'debug': self._debug(plan)
+                }, None
 
-            # Step 5: Execute query
-            results = self.db.execute_query(sql_query)
+            job = {
+                'plan': plan,
+                'page_size': None,
+                'key_column': None,
+                'row_cap': None,
+                'count_accuracy': count_accuracy,
+                'session_id': session_id
+            }
+            paged = None
+            if page_size or cursor:
+                job['page_size'] = _row_count(page_size, Config.DEFAULT_PAGE_SIZE,
+                                              Config.MAX_PAGE_SIZE)
+                paged = self._paginate(plan, job['page_size'], cursor)
+                if paged:
+                    job['sql'], job['params'], job['key_column'] = paged
+            if not paged:
+                job['page_size'] = None
+                job['sql'], job['params'], job['row_cap'] = self._capped(plan)
+            return None, job
 
-            if results is None:
-                return {
-                    'success': False,
-                    'message': 'Error executing query',
-                    'data': None,
-                    'sql': sql_query,
-                    'debug': {
-                        'intent': intent,
-                        'entities': entities,
-                        'keywords': keywords
-                    }
-                }
+        except QueryTimeoutError:
+            return self._timed_out(deadline), None
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error: {str(e)}',
+                'data': None
+            }, None
 
-            # Step 6: Format response
-            response_text = self._format_response(results, intent)
+    def run_job(self, job, timings=None, deadline=None):
+        """Check a job from prepare_message against the EXPLAIN row budget,
+        run it and turn its rows into the response"""
+        page_size = job['page_size']
+        try:
+            plan, rejected = self._cost_checked(job['plan'], timings, deadline)
+            if rejected:
+                return rejected
 
-            return {
-                'success': True,
-                'message': response_text,
-                'data': results,
-                'sql': sql_query,
-                'count': len(results),
-                'debug': {
-                    'intent': intent,
-                    'entities': entities,
-                    'keywords': keywords
+            # Step 5: Execute query (or serve it from the result cache)
+            with self._stage('execute', timings):
+                results, cached, count_info = self._execute(
+                    plan, job['sql'], job['params'], job['count_accuracy'], deadline)
+
+            page = None
+            if page_size and results is not None:
+                has_more = len(results) > page_size
+                results = results[:page_size]
+                page = {
+                    'size': page_size,
+                    'has_more': has_more,
+                    'next_cursor': (_encode_cursor(plan['sql'], plan['params'],
+                                                   results[-1][job['key_column']])
+                                    if has_more else None)
                 }
-            }
 
+            response = self._build_response(plan, results, cached, job['sql'], job['params'],
+                                            timings, page, job['row_cap'], count_info)
+            self._remember(job['session_id'], plan, response)
+            return response
+
+        except QueryTimeoutError:
+            return self._timed_out(deadline)
         except Exception as e:
             return {
                 'success': False,
@@ -96,15 +347,631 @@ class Chatbot:
                 'data': None
             }
 
-    def _format_response(self, results, intent):
+    def _build_response(self, plan, results, cached, sql_query, params,
+                        timings=None, page=None, row_cap=None, count_info=None):
+        """Turn executed query results into the chat response.
+
+        ``row_cap`` is the cap the query was limited to (it fetched one row
+        more); beyond it the rows are cut and the answer flagged truncated.
+        ``count_info`` describes a count served by the row counter.
+        """
+        if results is None:
+            return {
+                'success': False,
+                'message': 'Error executing query',
+                'data': None,
+                'sql': sql_query,
+                'params': params,
+                'debug': self._debug(plan)
+            }
+
+        truncated = row_cap is not None and len(results) > row_cap
+        if truncated:
+            results = results[:row_cap]
+
+        # Step 6: Format response
+        with self._stage('format', timings):
+            response_text = self._format_response(results, plan['intent'],
+                                                  plan['entities'])
+        self.metrics.observe('chatbot_result_rows', len(results),
+                             'Rows returned per answer', buckets=COUNT_BUCKETS)
+
+        response = {
+            'success': True,
+            'message': response_text,
+            'data': results,
+            'sql': sql_query,
+            'params': params,
+            'count': len(results),
+            'debug': self._debug(plan, cached=cached)
+        }
+        if page:
+            response['page'] = page
+        if row_cap is not None:
+            response['truncated'] = truncated
+        if count_info is not None:
+            response['count_accuracy'] = count_info['accuracy']
+            response['count_age'] = count_info['age']
+            if count_info['accuracy'] == 'estimated':
+                response['message'] = (f"Found about {results[0]['count']:,} records "
+                                       f"(estimated).")
+        elif plan['intent'] == 'count' and not plan['entities'].get('group_by'):
+            response['count_accuracy'] = 'exact'
+        if truncated:
+            estimated = self.row_counter.estimate(plan['entities']['table'])
+            estimate = estimated[0] if estimated else None
+            response['estimated_total'] = estimate
+            response['message'] += self._truncation_note(row_cap, estimate,
+                                                         filtered=bool(plan['params']))
+        return response
+
+    @staticmethod
+    def _truncation_note(row_cap, estimate, filtered):
+        """Sentence telling the user the answer was cut at the row cap"""
+        if estimate is None:
+            return f" Showing the first {row_cap:,} rows."
+        if filtered:
+            # The estimate covers the whole table, not just the matching rows
+            return (f" Showing the first {row_cap:,} rows "
+                    f"(the table has about {estimate:,}).")
+        return f" Showing the first {row_cap:,} of about {estimate:,} rows."
+
+    def process_messages(self, messages, max_workers=None, timeout=None):
+        """Answer a batch of messages; responses come back in input order.
+
+        Identical messages are answered once, planning shares the plan and
+        fuzzy-match caches across the batch, and distinct statements are
+        cost-checked and run concurrently on a thread pool where each worker
+        checks out its own pooled connection. A failure only affects its own
+        item. The batch shares one deadline, as in process_message.
+        """
+        if not self.ensure_initialized():
+            return [{
+                'success': False,
+                'message': 'Chatbot is not connected to database',
+                'data': None
+            } for _ in messages]
+
+        deadline = self.request_deadline(timeout)
+        plans = {}
+        for message in dict.fromkeys(messages):
+            try:
+                plans[message] = self.plan_message(message)
+            except Exception as e:
+                plans[message] = e
+
+        max_workers = max_workers or Config.BATCH_MAX_WORKERS
+        answers = {}
+        with ThreadPoolExecutor(max_workers=max_workers,
+                                thread_name_prefix='chatbot-batch') as executor:
+            statements = {}
+            bounded = {}
+            for message, plan in plans.items():
+                if isinstance(plan, dict) and not plan['error']:
+                    sql_query, params, row_cap = bounded[message] = self._capped(plan)
+                    key = (sql_query, json.dumps(params, default=str))
+                    if key not in statements:
+                        statements[key] = executor.submit(
+                            self._execute_checked, plan, sql_query, params, deadline)
+
+            for message, plan in plans.items():
+                if isinstance(plan, QueryTimeoutError):
+                    answers[message] = self._timed_out(deadline)
+                elif isinstance(plan, Exception):
+                    answers[message] = {
+                        'success': False,
+                        'message': f'Error: {str(plan)}',
+                        'data': None
+                    }
+                elif plan['error']:
+                    answers[message] = {
+                        'success': False,
+                        'message': plan['error'],
+                        'data': None,
+                        'debug': self._debug(plan)
+                    }
+                else:
+                    sql_query, params, row_cap = bounded[message]
+                    key = (sql_query, json.dumps(params, default=str))
+                    try:
+                        estimated_rows, execution = statements[key].result()
+                        # Messages sharing a statement share its estimate
+                        plan = dict(plan, estimated_rows=estimated_rows)
+                        answers[message] = self._over_budget(plan)
+                        if execution is not None:
+                            results, cached, count_info = execution
+                            answers[message] = self._build_response(
+                                plan, results, cached, sql_query, params,
+                                row_cap=row_cap, count_info=count_info)
+                    except QueryTimeoutError:
+                        answers[message] = self._timed_out(deadline)
+                    except Exception as e:
+                        answers[message] = {
+                            'success': False,
+                            'message': f'Error: {str(e)}',
+                            'data': None
+                        }
+                outcome = 'success' if answers[message].get('success') else 'error'
+                self.metrics.inc('chatbot_requests_total', outcome=outcome)
+
+        return [answers[message] for message in messages]
+
+    def stream_message(self, user_message, batch_size=None, timeout=None, debug=False):
+        """Yield a header record, then every result row, then a trailer.
+
+        Rows come from an unbuffered server-side cursor, so memory use does
+        not depend on the size of the result. Streams have no deadline
+        unless the caller sets ``timeout``, since exporting a large result
+        legitimately takes long. The header carries the debug block only
+        with ``debug``.
+        """
+        if not self.ensure_initialized():
+            yield {'success': False, 'message': 'Chatbot is not connected to database'}
+            return
+
+        deadline = Deadline(self._request_timeout(timeout, capped=False)
+                            if timeout is not None else None)
+        try:
+            plan = self.plan_message(user_message)
+            if plan['error']:
+                header = {'success': False, 'message': plan['error']}
+            else:
+                plan, rejected = self._cost_checked(plan, deadline=deadline)
+                header = rejected or {'success': True, 'sql': plan['sql'],
+                                      'params': plan['params']}
+        except QueryTimeoutError:
+            yield self._timed_out(deadline)
+            return
+        if debug:
+            header['debug'] = self._debug(plan)
+        else:
+            header.pop('debug', None)
+        yield header
+        if not header['success']:
+            return
+        count = 0
+        try:
+            for row in self.db.stream_query(plan['sql'], plan['params'],
+                                            batch_size=_row_count(batch_size,
+                                                                  Config.STREAM_BATCH_SIZE,
+                                                                  Config.STREAM_MAX_BATCH_SIZE),
+                                            deadline=deadline):
+                count += 1
+                yield row
+        except QueryTimeoutError:
+            yield dict(self._timed_out(deadline), done=True, count=count)
+            return
+        except Exception as e:
+            yield {'done': True, 'success': False, 'count': count,
+                   'message': f'Error: {str(e)}'}
+            return
+        yield {'done': True, 'success': True, 'count': count}
+
+    def _capped(self, plan):
+        """The plan's SQL bounded by the row cap: ``(sql, params, row_cap)``.
+
+        Single-row answers and top-N queries (which carry their own, capped,
+        LIMIT) run unchanged with ``row_cap`` None.
+        """
+        intent = plan['intent']
+        if intent == 'top_n' or (intent in ('count', 'aggregate')
+                                 and not plan['entities'].get('group_by')):
+            return plan['sql'], plan['params'], None
+        return self.query_generator.cap_rows(plan['sql'], plan['params'],
+                                             plan['entities']['table'])
+
+    def _paginate(self, plan, page_size, cursor):
+        """Keyset-paginated form of a plan's SQL, or None if it can't be paged"""
+        if plan['intent'] in _UNPAGED_INTENTS:
+            return None
+        after = _decode_cursor(cursor, plan['sql'], plan['params']) if cursor else None
+        columns = plan['entities']['columns'] if plan['intent'] == 'specific_field' else None
+        return self.query_generator.paginate(plan['sql'], plan['params'],
+                                             plan['entities']['table'],
+                                             columns, after, page_size)
+
+    def plan_message(self, user_message, timings=None):
+        """Resolve a message to its intent, entities and SQL, without
+        touching the database.
+
+        Plans are memoized on the cleaned message, so repeated and
+        near-identical questions (case, spacing) skip tokenization and fuzzy
+        matching. The cache is keyed on the schema version and resets when
+        the schema changes; ``cache_key`` lets the EXPLAIN estimate be added
+        to the cached plan later (see _cost_checked).
+        """
+        key = self._plan_key(user_message)
+        version = self.pattern_matcher.schema_version
+        plan = self.plan_cache.get(key, version)
+        if plan is not None:
+            # The cached plan is frozen and shared: copy only its top level
+            plan = dict(plan)
+            plan['cached'] = True
+            return plan
+
+        # Step 1: Preprocess input
+        with self._stage('preprocess', timings):
+            processed = self.preprocessor.preprocess(user_message)
+            keywords = processed['keywords']
+
+        # Step 2: Detect intent
+        with self._stage('intent', timings):
+            intent = self.pattern_matcher.detect_intent(user_message)
+
+        # Step 3: Extract entities (improved)
+        with self._stage('entities', timings):
+            entities = self.pattern_matcher.extract_entities(user_message, keywords)
+
+        # Step 4: Generate SQL query
+        with self._stage('generate_sql', timings):
+            sql_query, params, error = self.query_generator.generate_sql(
+                intent, entities, user_message)
+
+        plan = {
+            'intent': intent,
+            'entities': entities,
+            'keywords': keywords,
+            'sql': sql_query,
+            'params': params,
+            'error': error,
+            'estimated_rows': None,
+            'cached': False,
+            'cache_key': (key, version)
+        }
+        self.plan_cache.put(key, version, plan)
+        return plan
+
+    def _refinement_plan(self, conversation, user_message, timings=None):
+        """Plan a follow-up that narrows the session's previous answer.
+
+        Returns None unless the message reads as a refinement, names no
+        other table, and adds a condition the previous question can be
+        narrowed by; the new condition is the last of ``entities['filters']``.
+        A follow-up asking for a count, aggregate or top N ("how many of
+        them are in sales") keeps the previous table and filters but is
+        answered with its own intent, and needs no new condition.
+        """
+        previous = conversation.entities
+        table = previous.get('table')
+        if not table or conversation.intent not in _REFINABLE_INTENTS:
+            return None
+        if not is_refinement(user_message):
+            return None
+
+        with self._stage('preprocess', timings):
+            keywords = self.preprocessor.preprocess(user_message)['keywords']
+        named = self.pattern_matcher.table_index.match_many(keywords, 85)
+        if any(name and name != table for name in named):
+            return None
+        with self._stage('entities', timings):
+            found = self.pattern_matcher.extract_entities(user_message, keywords, table)
+        narrows = found['filter_column'] and found['filter_value'] not in (None, '')
+
+        # A filter question's own condition must be in its entities to be
+        # carried into the narrower query
+        if (conversation.intent in ROW_INTENTS and conversation.intent != 'select_all'
+                and not previous.get('filter_column')):
+            return None
+        entities = copy.deepcopy(previous)
+        intent = self.pattern_matcher.detect_intent(user_message)
+        if intent in _UNPAGED_INTENTS:
+            for field in _SUMMARY_FIELDS:
+                entities[field] = found.get(field)
+        elif not narrows:
+            return None
+        else:
+            intent = conversation.intent
+            if intent in ROW_INTENTS:
+                intent = 'select_all'
+        if narrows:
+            entities['filters'] = list(entities.get('filters') or []) + [
+                [found['filter_column'], found['filter_operator'], found['filter_value']]
+            ]
+        with self._stage('generate_sql', timings):
+            sql_query, params, error = self.query_generator.generate_sql(
+                intent, entities, user_message)
+        return {
+            'intent': intent,
+            'entities': entities,
+            'keywords': keywords,
+            'sql': sql_query,
+            'params': params,
+            'error': error,
+            'estimated_rows': None,
+            'cached': False,
+            'refined': True
+        }
+
+    def _remember(self, session_id, plan, response):
+        """Keep a successful answer as the session's latest"""
+        if not session_id or not response.get('success'):
+            return
+        complete = 'page' not in response and not response.get('truncated')
+        self.conversations.remember(session_id, plan, response['data'], complete)
+
+    def _stage(self, stage, timings=None):
+        """Time one pipeline stage into the stage latency histogram"""
+        return self.metrics.timer('chatbot_stage_seconds', timings,
+                                  'Latency of each process_message stage', stage=stage)
+
+    def _register_gauges(self):
+        """Expose pool and cache state as gauges read at scrape time"""
+        def pool():
+            stats = self.db.pool_stats()
+            if stats is None:
+                return None
+            return {(('state', k),): v for k, v in stats.items()}
+
+        def result_cache():
+            if self.result_cache is None:
+                return None
+            return {(('stat', k),): v for k, v in self.result_cache.stats().items()}
+
+        def plan_cache():
+            return {(('stat', k),): v for k, v in self.plan_cache.stats().items()}
+
+        def row_counter():
+            return {(('stat', k),): v for k, v in self.row_counter.stats().items()}
+
+        def conversations():
+            return {(('stat', k),): v for k, v in self.conversations.stats().items()}
+
+        self.metrics.gauge('chatbot_db_pool_connections', pool,
+                           'Connection pool occupancy')
+        self.metrics.gauge('chatbot_result_cache', result_cache,
+                           'Result cache entries, bytes and hit/miss counts')
+        self.metrics.gauge('chatbot_plan_cache', plan_cache,
+                           'Plan cache entries and hit/miss counts')
+        self.metrics.gauge('chatbot_row_counter', row_counter,
+                           'Cached table row counts and hot tables')
+        self.metrics.gauge('chatbot_conversations', conversations,
+                           'Chat sessions remembered and those keeping rows')
+        self.metrics.gauge('chatbot_ready', lambda: int(self.is_ready),
+                           'Whether the chatbot is initialized')
+
+    def _plan_key(self, user_message):
+        """Cache key for a message: its cleaned text plus the details that
+        clean_text discards but planning still reads (operators, decimal
+        points, quoted values and capitalized names)"""
+        slots = self.pattern_matcher.intent_engine.analyze(user_message)['slots']
+        return (
+            self.preprocessor.clean_text(user_message),
+            ''.join(_SIGNIFICANT_PUNCTUATION.findall(user_message.lower())),
+            tuple(slots['numbers']),
+            tuple(slots['quoted']),
+            slots['name_ref']
+        )
+
+    def request_deadline(self, timeout=None):
+        """The deadline of a request asking for ``timeout`` seconds"""
+        return Deadline(self._request_timeout(timeout))
+
+    @staticmethod
+    def _request_timeout(timeout=None, capped=True):
+        """Seconds a request may take: the caller's ``timeout`` if given (a
+        number or numeric string), never more than Config.REQUEST_TIMEOUT
+        unless not ``capped``; Config.REQUEST_TIMEOUT when missing or
+        invalid (None: no deadline)"""
+        budget = Config.REQUEST_TIMEOUT if Config.REQUEST_TIMEOUT > 0 else None
+        try:
+            timeout = float(timeout) if timeout is not None else None
+        except (TypeError, ValueError):
+            timeout = None
+        if timeout is None or timeout <= 0:
+            return budget
+        if not capped:
+            return timeout
+        return min(timeout, budget) if budget else timeout
+
+    def _timed_out(self, deadline):
+        """Response for a request whose database work ran out of time"""
+        self.metrics.inc('chatbot_timeouts_total',
+                         help_text='Requests cancelled at their deadline')
+        after = f" after {deadline.seconds:g}s" if deadline.seconds else ''
+        return {
+            'success': False,
+            'message': f"The query timed out{after}. Try a narrower question.",
+            'data': None,
+            'timed_out': True
+        }
+
+    @staticmethod
+    def _needs_cost_check(intent, entities, params):
+        """Whether a statement's cost depends on more than its LIMIT: filters,
+        aggregates, grouping and ordering can read the whole table"""
+        if Config.EXPLAIN_ROW_BUDGET <= 0:
+            return False
+        return bool(params) or intent in ('aggregate', 'top_n') or bool(entities.get('group_by'))
+
+    def _estimate_rows(self, plan, timings=None, deadline=None):
+        """EXPLAIN's row estimate for a plan that needs a cost check, else None"""
+        if plan['error'] or not self._needs_cost_check(plan['intent'], plan['entities'],
+                                                       plan['params']):
+            return None
+        with self._stage('explain', timings):
+            return self.db.explain_rows(plan['sql'], plan['params'], deadline)
+
+    def _cost_checked(self, plan, timings=None, deadline=None):
+        """``(plan, rejected)``: the plan with EXPLAIN's row estimate filled
+        in, and the rejection response when it is over budget, else None.
+
+        The estimate is stored with the cached plan, so a repeated question
+        is not explained again until Config.EXPLAIN_ESTIMATE_TTL seconds
+        later (or a schema change), as tables grow and shrink.
+        """
+        estimated_at = plan.get('estimated_at')
+        stale = (estimated_at is None
+                 or time.monotonic() - estimated_at >= Config.EXPLAIN_ESTIMATE_TTL)
+        if plan['estimated_rows'] is None or stale:
+            rows = self._estimate_rows(plan, timings, deadline)
+            if rows is not None:
+                plan = dict(plan, estimated_rows=rows, estimated_at=time.monotonic())
+                if plan.get('cache_key'):
+                    key, version = plan['cache_key']
+                    self.plan_cache.put(key, version, dict(plan, cached=False))
+        return plan, self._over_budget(plan)
+
+    def _execute_checked(self, plan, sql_query, params, deadline=None):
+        """A batch worker's unit of work: cost-check the plan, then run its
+        bounded statement unless over budget. Returns ``(estimated_rows,
+        execution)``, ``execution`` being _execute's result or None"""
+        plan, rejected = self._cost_checked(plan, deadline=deadline)
+        if rejected:
+            return plan['estimated_rows'], None
+        return plan['estimated_rows'], self._execute(plan, sql_query, params, None, deadline)
+
+    def _over_budget(self, plan):
+        """Rejection response for a plan the optimizer expects to read more
+        than Config.EXPLAIN_ROW_BUDGET rows, or None if it may run"""
+        rows = plan.get('estimated_rows')
+        budget = Config.EXPLAIN_ROW_BUDGET
+        if rows is None or budget <= 0 or rows <= budget:
+            return None
+        self.metrics.inc('chatbot_rejected_plans_total',
+                         help_text='Questions refused by the EXPLAIN row budget',
+                         intent=plan['intent'])
+
+        table = plan['entities']['table']
+        suggestions = [
+            column for column in self.pattern_matcher.indexed_columns(table)
+            if column not in (self.pattern_matcher.primary_key(table),
+                              plan['entities'].get('filter_column'),
+                              plan['entities'].get('group_by'))
+        ]
+        message = (f"This question would read about {rows:,} rows of {table}, "
+                   f"more than the {budget:,} allowed. Please narrow it down")
+        if suggestions:
+            message += f", for example by {', '.join(suggestions[:3])}"
+        return {
+            'success': False,
+            'message': message + '.',
+            'data': None,
+            'needs_narrowing': True,
+            'estimated_rows': rows,
+            'sql': plan['sql'],
+            'params': plan['params'],
+            'debug': self._debug(plan)
+        }
+
+    def _debug(self, plan, **extra):
+        """Debug block describing how a message was resolved"""
+        debug = {
+            'intent': plan['intent'],
+            'entities': plan['entities'],
+            'keywords': plan['keywords'],
+            'plan_cached': plan['cached']
+        }
+        if plan.get('refined'):
+            debug['refined'] = True
+        if plan.get('estimated_rows') is not None:
+            debug['estimated_rows'] = plan['estimated_rows']
+        debug.update(extra)
+        return debug
+
+    @staticmethod
+    def _counts_whole_table(plan):
+        """Whether a plan is an unfiltered, ungrouped "how many" question"""
+        entities = plan['entities']
+        return (plan['intent'] == 'count' and not plan['params']
+                and not entities.get('group_by'))
+
+    def _execute(self, plan, sql_query, params, count_accuracy=None, deadline=None):
+        """Run a plan's statement: ``(rows, cached, count_info)``.
+
+        Whole-table counts go to the row counter at the requested accuracy
+        (falling back to the query if it cannot count); ``count_info`` is
+        None for everything else.
+        """
+        if self._counts_whole_table(plan):
+            accuracy = count_accuracy if count_accuracy in ACCURACY_LEVELS \
+                else Config.COUNT_ACCURACY
+            counted = self.row_counter.count(plan['entities']['table'], accuracy,
+                                             deadline)
+            if counted is not None:
+                count, info = counted
+                return [{'count': count}], info['age'] > 0, info
+        results, cached = self._run_query(sql_query, params, deadline)
+        return results, cached, None
+
+    def _run_query(self, sql_query, params=None, deadline=None):
+        """Execute a query through the result cache; returns (rows, cached)"""
+        if self.result_cache is None:
+            return self.db.execute_query(sql_query, params, deadline), False
+        hit, results = self.result_cache.get(sql_query, params)
+        if hit:
+            return results, True
+        results = self.db.execute_query(sql_query, params, deadline)
+        if results is not None:
+            self.result_cache.put(sql_query, params, results)
+        return results, False
+
+    def invalidate_table(self, table):
+        """Forget cached results that read ``table`` (e.g. after a write)"""
+        self.row_counter.invalidate(table)
+        if self.result_cache is None:
+            return 0
+        return self.result_cache.invalidate_table(table)
+
+    def _schema_changed(self, tables):
+        # Cached plans carry the old schema version and are skipped from now
+        # on; cached results and counts of the changed tables are dropped
+        for table in tables:
+            self.invalidate_table(table)
+
+    def get_available_tables(self):
+        """Return the names of the tables the chatbot can query"""
+        if not self.ensure_initialized():
+            return []
+        return sorted(self.pattern_matcher.table_mappings.keys())
+
+    @staticmethod
+    def _format_value(value):
+        """Numbers with thousands separators, two decimals when fractional"""
+        if isinstance(value, bool) or not isinstance(value, (int, float, Decimal)):
+            return str(value)
+        if value == int(value):
+            return f"{int(value):,}"
+        return f"{value:,.2f}"
+
+    def _format_groups(self, results):
+        """The grouped rows as "key: value" pairs (group column first, value last)"""
+        parts = [
+            f"{next(iter(row.values()))}: {self._format_value(list(row.values())[-1])}"
+            for row in results[:_SUMMARY_GROUPS]
+        ]
+        if len(results) > _SUMMARY_GROUPS:
+            parts.append(f"and {len(results) - _SUMMARY_GROUPS} more")
+        return ', '.join(parts)
+
+    def _format_response(self, results, intent, entities=None):
         """Format database results into human-readable text"""
         if not results:
             return "No results found for your query."
+        entities = entities or {}
 
         if intent == 'count':
+            if entities.get('group_by'):
+                return (f"Counts by {entities['group_by']} ({len(results)} groups): "
+                        f"{self._format_groups(results)}")
             count = results[0].get('count', len(results))
             return f"Found {count} records."
 
+        if intent == 'aggregate' and entities.get('aggregate'):
+            word = _AGGREGATE_LABELS[entities['aggregate']]
+            label = entities['aggregate_column'].replace('_', ' ')
+            if not label.startswith(word + ' '):
+                label = f"{word} {label}"
+            if entities.get('group_by'):
+                return (f"{label.capitalize()} by {entities['group_by']} "
+                        f"({len(results)} groups): {self._format_groups(results)}")
+            value = list(results[0].values())[-1]
+            return f"The {label} is {self._format_value(value)}."
+
+        if intent == 'top_n' and entities.get('order_by'):
+            order = 'highest' if entities.get('order_direction') != 'ASC' else 'lowest'
+            return (f"Top {len(results)} {entities.get('table') or 'results'} "
+                    f"by {entities['order_by']} ({order} first).")
+
         # If specific field was requested and a single row returned, you could format values
         if len(results) == 1 and len(results[0]) <= 3:
             # Compact single-record summary
@@ -114,11 +981,14 @@ class Chatbot:
         return f"Found {len(results)} results."
 
     def close(self):
-        """Close database connection if open"""
+        """Close the database connection pool if open"""
         try:
-            if self.db and getattr(self.db, 'connection', None):
-                if self.db.connection.is_connected():
-                    self.db.connection.close()
-                print("Database connection closed.")
+            self.row_counter.close()
+            if self.schema_watcher is not None:
+                self.schema_watcher.stop()
+            if self.db:
+                self.db.close()
+            self.is_connected = False
+            self.state = 'idle'
         except Exception as e:
             print(f"Error closing database: {e}")
@@ -3,6 +3,17 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _parse_mapping(value):
+    """Parse 'orders=5,products=60' into {'orders': 5.0, 'products': 60.0}"""
+    mapping = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            key, number = item.split('=', 1)
+            mapping[key.strip()] = float(number)
+    return mapping
+
+
 class Config:
  # MySQL Configuration
     MYSQL_HOST = os.getenv('MYSQL_HOST', 'localhost')
@@ -10,6 +21,64 @@ class Config:
     MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD', '')
     MYSQL_DATABASE = os.getenv('MYSQL_DATABASE', 'company_db')
     MYSQL_PORT = int(os.getenv('MYSQL_PORT', 3306))
+ # Connection Pool Configuration
+    MYSQL_POOL_SIZE = int(os.getenv('MYSQL_POOL_SIZE', 5))
+    MYSQL_POOL_TIMEOUT = float(os.getenv('MYSQL_POOL_TIMEOUT', 10))
+    MYSQL_POOL_PING_INTERVAL = float(os.getenv('MYSQL_POOL_PING_INTERVAL', 30))
+    MYSQL_STATEMENT_CACHE_SIZE = int(os.getenv('MYSQL_STATEMENT_CACHE_SIZE', 64))
+ # Startup Configuration
+    WARMUP_ON_START = os.getenv('WARMUP_ON_START', 'True').lower() in ('1', 'true', 'yes')
+    INIT_RETRY_INTERVAL = float(os.getenv('INIT_RETRY_INTERVAL', 5))
+ # Schema Configuration
+    SCHEMA_SNAPSHOT_PATH = os.getenv('SCHEMA_SNAPSHOT_PATH', '.schema_snapshot.json')
+    SCHEMA_SNAPSHOT_MAX_AGE = float(os.getenv('SCHEMA_SNAPSHOT_MAX_AGE', 3600))
+ # Result Cache Configuration
+    RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+    RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', 30))
+    RESULT_CACHE_TABLE_TTLS = _parse_mapping(os.getenv('RESULT_CACHE_TABLE_TTLS', ''))
+    RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', 1024))
+ # Plan Cache Configuration
+    PLAN_CACHE_SIZE = int(os.getenv('PLAN_CACHE_SIZE', 2048))
+ # Result Delivery Configuration
+    DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', 100))
+    MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 1000))
+    STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 500))
+    STREAM_MAX_BATCH_SIZE = int(os.getenv('STREAM_MAX_BATCH_SIZE', 5000))
+ # Row Cap Configuration (0 disables the cap)
+    MAX_ROWS = int(os.getenv('MAX_ROWS', 1000))
+    TABLE_ROW_CAPS = _parse_mapping(os.getenv('TABLE_ROW_CAPS', ''))
+ # Row Count Configuration (COUNT_ACCURACY: exact, cached or estimate)
+    COUNT_ACCURACY = os.getenv('COUNT_ACCURACY', 'cached')
+    COUNT_CACHE_TTL = float(os.getenv('COUNT_CACHE_TTL', 60))
+    COUNT_HOT_THRESHOLD = int(os.getenv('COUNT_HOT_THRESHOLD', 5))
+    COUNT_REFRESH_INTERVAL = float(os.getenv('COUNT_REFRESH_INTERVAL', 30))
+ # Query Guard Configuration (EXPLAIN_ROW_BUDGET 0 disables the EXPLAIN check)
+    EXPLAIN_ROW_BUDGET = int(os.getenv('EXPLAIN_ROW_BUDGET', 1000000))
+    EXPLAIN_ESTIMATE_TTL = float(os.getenv('EXPLAIN_ESTIMATE_TTL', 300))
+    INDEX_TIE_MARGIN = float(os.getenv('INDEX_TIE_MARGIN', 5))
+ # Deadline Configuration (seconds per request, 0 disables)
+    REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', 10))
+ # Value Index Configuration (VALUE_INDEX_MAX_BYTES 0 disables the index)
+    VALUE_INDEX_MAX_BYTES = int(os.getenv('VALUE_INDEX_MAX_BYTES', 1024 * 1024))
+    VALUE_INDEX_MAX_DISTINCT = int(os.getenv('VALUE_INDEX_MAX_DISTINCT', 100))
+    VALUE_INDEX_SCAN_ROWS = int(os.getenv('VALUE_INDEX_SCAN_ROWS', 100000))
+ # Conversation Configuration (CONVERSATION_MAX_ROWS: rows kept for in-memory follow-ups)
+    CONVERSATION_MAX_SESSIONS = int(os.getenv('CONVERSATION_MAX_SESSIONS', 1000))
+    CONVERSATION_TTL = float(os.getenv('CONVERSATION_TTL', 1800))
+    CONVERSATION_MAX_ROWS = int(os.getenv('CONVERSATION_MAX_ROWS', 1000))
+ # Schema Watcher Configuration (seconds between checks, 0 disables)
+    SCHEMA_WATCH_INTERVAL = float(os.getenv('SCHEMA_WATCH_INTERVAL', 60))
+ # Response Configuration (RESPONSE_FORMAT: rows or columnar)
+    RESPONSE_FORMAT = os.getenv('RESPONSE_FORMAT', 'rows')
+    COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+ # Batch Configuration
+    BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', 100))
+    BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', 4))
+ # Async Server Configuration (asgi.py; ASYNC_DB_WORKERS defaults to the pool size)
+    ASYNC_CPU_WORKERS = int(os.getenv('ASYNC_CPU_WORKERS', 4))
+    ASYNC_DB_WORKERS = int(os.getenv('ASYNC_DB_WORKERS', MYSQL_POOL_SIZE))
+    ASYNC_MAX_PENDING = int(os.getenv('ASYNC_MAX_PENDING', 10000))
  # Flask Configuration
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
     DEBUG = os.getenv('DEBUG', True)
\ No newline at end of file
@@ -0,0 +1,25 @@
+"""Shared fixtures: the chatbot on FakeDatabaseManager, so the tests need
+no MySQL server"""
+import pytest
+
+from chatbot_core import Chatbot
+from config import Config
+from fake_database import FakeDatabaseManager
+
+
+@pytest.fixture(autouse=True)
+def config(monkeypatch):
+    # Keep the fixture schema out of the real snapshot and skip the watcher thread
+    monkeypatch.setattr(Config, 'SCHEMA_SNAPSHOT_PATH', '')
+    monkeypatch.setattr(Config, 'SCHEMA_WATCH_INTERVAL', 0)
+    monkeypatch.setattr(Config, 'EXPLAIN_ROW_BUDGET', 1000000)
+    monkeypatch.setattr(Config, 'REQUEST_TIMEOUT', 10)
+    return Config
+
+
+@pytest.fixture
+def chatbot():
+    bot = Chatbot(db=FakeDatabaseManager())
+    assert bot.initialize()
+    yield bot
+    bot.close()
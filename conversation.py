@@ -0,0 +1,137 @@
+import copy
+import operator
+import re
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+
+# Follow-ups that narrow the previous answer, marked by a narrowing word up
+# front ("only those in sales", "just electronics") or by referring back to
+# it ("which of them earn over 50000"); "which products ..." is a new question
+_REFINEMENT = re.compile(
+    r"^\s*(?:(?:and|but|now|then)\s+)*(?:only|just|those|filter|narrow)\b"
+    r"|\b(?:those|them|these|they|ones)\b",
+    re.IGNORECASE
+)
+
+# Intents whose rows are whole table rows, which a refinement can filter
+ROW_INTENTS = frozenset({'select_all', 'filter_numeric', 'filter_text'})
+
+_OPERATORS = {
+    '=': operator.eq,
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge
+}
+
+
+def is_refinement(text):
+    """Whether a message reads as narrowing the previous answer"""
+    return bool(_REFINEMENT.search(text))
+
+
+def _as_number(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        return None
+
+
+def _matches(row_value, op, value):
+    """``row_value <op> value`` the way MySQL compares them: numerically for
+    numbers, case-insensitively for text, never true for NULL"""
+    if row_value is None:
+        return False
+    compare = _OPERATORS.get(op, operator.eq)
+    if isinstance(row_value, (int, float, Decimal)):
+        number = _as_number(value)
+        if number is None:
+            return False
+        return compare(_as_number(row_value), number)
+    return compare(str(row_value).casefold(), str(value).casefold())
+
+
+class Conversation:
+    """What one chat session last asked and got back.
+
+    ``rows`` is a copy of the previous answer when it was complete and
+    small enough to keep, else None.
+    """
+
+    def __init__(self, intent, entities, rows=None):
+        self.intent = intent
+        self.entities = entities
+        self.rows = rows
+        self.updated_at = time.monotonic()
+
+    def filter_rows(self, column, op, value):
+        """The kept rows matching ``column <op> value``, or None when there
+        are no rows to filter or they lack the column"""
+        if self.rows is None:
+            return None
+        if self.rows and column not in self.rows[0]:
+            return None
+        return [row for row in self.rows if _matches(row.get(column), op, value)]
+
+
+class ConversationStore:
+    """Per-session conversation state, LRU-bounded to ``max_sessions`` and
+    forgotten after ``ttl`` seconds of inactivity.
+
+    Answers of up to ``max_rows`` rows are kept so a follow-up can be
+    filtered in memory.
+    """
+
+    def __init__(self, max_sessions=1000, ttl=1800, max_rows=1000):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """Return the session's conversation or None"""
+        with self._lock:
+            conversation = self._sessions.get(session_id)
+            if conversation is None:
+                return None
+            if time.monotonic() - conversation.updated_at > self.ttl:
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+            return conversation
+
+    def remember(self, session_id, plan, rows, complete=True):
+        """Record the answer to ``plan`` as the session's latest.
+
+        The rows are kept only for row-returning intents, when ``complete``
+        (not truncated or paged) and at most ``max_rows`` long.
+        """
+        if self.max_sessions <= 0:
+            return
+        keep = (complete and rows is not None and plan['intent'] in ROW_INTENTS
+                and len(rows) <= self.max_rows)
+        conversation = Conversation(plan['intent'], copy.deepcopy(plan['entities']),
+                                    list(rows) if keep else None)
+        with self._lock:
+            self._sessions[session_id] = conversation
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def forget(self, session_id):
+        """Drop the session's conversation"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self):
+        """Number of sessions held and how many keep rows"""
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'with_rows': sum(1 for c in self._sessions.values() if c.rows is not None)
+            }
@@ -1,42 +1,373 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, InterfaceError, OperationalError
 from config import Config
 
+# "Query execution was interrupted, maximum statement execution time exceeded"
+ER_QUERY_TIMEOUT = 3024
+
+# MAX_EXECUTION_TIME is rounded down to this step, so queries with similar
+# budgets share one session setting instead of each issuing a SET
+_EXECUTION_TIME_STEP_MS = 250
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes free before the checkout timeout"""
+
+
+class QueryTimeoutError(Exception):
+    """Raised when a query does not finish within its request's deadline"""
+
+
+def _execution_time_ms(deadline):
+    """MAX_EXECUTION_TIME for what is left of ``deadline``; 0 (no limit)
+    without one"""
+    remaining = deadline.remaining() if deadline is not None else None
+    if remaining is None:
+        return 0
+    ms = int(remaining * 1000)
+    if ms >= _EXECUTION_TIME_STEP_MS:
+        ms -= ms % _EXECUTION_TIME_STEP_MS
+    return max(1, ms)
+
+
+class PooledConnection:
+    """A MySQL connection owned by a ConnectionPool.
+
+    Keeps an LRU of prepared-statement cursors keyed by SQL template, so a
+    template is parsed by the server once per connection and re-executed
+    with new parameters afterwards.
+    """
+
+    def __init__(self, raw, statement_cache_size=64):
+        self.raw = raw
+        self.last_used = time.monotonic()
+        self.statement_cache_size = statement_cache_size
+        self.statements = OrderedDict()
+        # Session MAX_EXECUTION_TIME last set on this connection (None: unknown)
+        self.max_execution_time = None
+
+    def cursor(self, **kwargs):
+        return self.raw.cursor(**kwargs)
+
+    def prepared(self, template):
+        """Return ``(template, cursor)`` with ``template`` prepared on this
+        connection.
+
+        The cursor only skips re-preparing when it is handed the very same
+        string object it last executed, so callers must execute the returned
+        template rather than their own copy.
+        """
+        entry = self.statements.get(template)
+        if entry is not None:
+            self.statements.move_to_end(template)
+            return entry
+        entry = (template, self.raw.cursor(prepared=True, dictionary=True))
+        self.statements[template] = entry
+        while len(self.statements) > self.statement_cache_size:
+            _, (_, cursor) = self.statements.popitem(last=False)
+            self._close_cursor(cursor)
+        return entry
+
+    def set_max_execution_time(self, ms):
+        """Limit how long the server runs each SELECT of this session
+        (0 = no limit); a no-op when the session already has that limit"""
+        if ms == self.max_execution_time:
+            return
+        cursor = self.raw.cursor()
+        try:
+            cursor.execute(f"SET SESSION MAX_EXECUTION_TIME = {int(ms)}")
+        finally:
+            cursor.close()
+        self.max_execution_time = ms
+
+    def reset_statements(self):
+        """Forget every prepared statement (e.g. after a reconnect)"""
+        for _, cursor in self.statements.values():
+            self._close_cursor(cursor)
+        self.statements.clear()
+
+    @staticmethod
+    def _close_cursor(cursor):
+        try:
+            cursor.close()
+        except Error:
+            pass
+
+    def is_connected(self):
+        try:
+            return self.raw.is_connected()
+        except Error:
+            return False
+
+    def close(self):
+        self.statements.clear()
+        try:
+            self.raw.close()
+        except Error:
+            pass
+
+
+class ConnectionPool:
+    """Fixed-size, thread-safe pool of MySQL connections.
+
+    Connections are opened lazily up to ``size``. A connection that has been
+    idle for longer than ``ping_interval`` seconds is pinged (and reconnected
+    if the server dropped it) before being handed out.
+    """
+
+    def __init__(self, connect_args, size=5, timeout=10, ping_interval=30,
+                 statement_cache_size=64):
+        self.connect_args = connect_args
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.statement_cache_size = statement_cache_size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+    def _open(self):
+        raw = mysql.connector.connect(autocommit=True, **self.connect_args)
+        return PooledConnection(raw, self.statement_cache_size)
+
+    def _check_health(self, conn):
+        """Ping a connection that sat idle too long, reconnecting if stale"""
+        if time.monotonic() - conn.last_used < self.ping_interval:
+            return conn
+        try:
+            connection_id = conn.raw.connection_id
+            conn.raw.ping(reconnect=True, attempts=2, delay=0)
+            if conn.raw.connection_id != connection_id:
+                # A new server session has none of our prepared statements
+                # and the server's default execution time limit
+                conn.reset_statements()
+                conn.max_execution_time = None
+            return conn
+        except Error:
+            conn.close()
+            return self._open()
+
+    def acquire(self, timeout=None):
+        """Check out a connection, waiting up to ``timeout`` seconds"""
+        if self._closed:
+            raise PoolTimeoutError("Connection pool is closed")
+        timeout = self.timeout if timeout is None else timeout
+
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                can_open = self._created < self.size
+                if can_open:
+                    self._created += 1
+            if can_open:
+                try:
+                    return self._open()
+                except Error:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            try:
+                conn = self._idle.get(timeout=timeout)
+            except queue.Empty:
+                raise PoolTimeoutError(
+                    f"No database connection available within {timeout}s"
+                )
+
+        try:
+            return self._check_health(conn)
+        except Error:
+            self._discard()
+            raise
+
+    def release(self, conn, broken=False):
+        """Return a connection to the pool, dropping it if it is broken"""
+        if self._closed or broken:
+            conn.close()
+            self._discard()
+            return
+        conn.last_used = time.monotonic()
+        self._idle.put(conn)
+
+    def _discard(self):
+        with self._lock:
+            self._created = max(0, self._created - 1)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager that checks a connection out and back in"""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except (OperationalError, InterfaceError):
+            self.release(conn, broken=True)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def stats(self):
+        """Return current pool occupancy"""
+        idle = self._idle.qsize()
+        return {
+            'size': self.size,
+            'open': self._created,
+            'idle': idle,
+            'in_use': max(0, self._created - idle)
+        }
+
+    def close(self):
+        """Close every idle connection and refuse further checkouts"""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            self._discard()
+
+
 class DatabaseManager:
     def __init__(self):
-        self.connection = None
+        self.pool = None
 
     def connect(self):
-        """Establish database connection"""
-        try:
-            self.connection = mysql.connector.connect(
-                host=Config.MYSQL_HOST,
-                user=Config.MYSQL_USER,
-                password=Config.MYSQL_PASSWORD,
-                database=Config.MYSQL_DATABASE,
-                port=Config.MYSQL_PORT
+        """Create the connection pool and verify that the database is reachable"""
+        if self.pool:
+            # Retrying after a failed start: don't leak the previous pool
+            self.close()
+        try:
+            self.pool = ConnectionPool(
+                {
+                    'host': Config.MYSQL_HOST,
+                    'user': Config.MYSQL_USER,
+                    'password': Config.MYSQL_PASSWORD,
+                    'database': Config.MYSQL_DATABASE,
+                    'port': Config.MYSQL_PORT
+                },
+                size=Config.MYSQL_POOL_SIZE,
+                timeout=Config.MYSQL_POOL_TIMEOUT,
+                ping_interval=Config.MYSQL_POOL_PING_INTERVAL,
+                statement_cache_size=Config.MYSQL_STATEMENT_CACHE_SIZE
             )
-            if self.connection.is_connected():
-                print("✅ Successfully connected to MySQL database")
-                return True
-        except Error as e:
+            with self.pool.connection() as conn:
+                if conn.is_connected():
+                    print(f"✅ Successfully connected to MySQL database "
+                          f"(pool size {self.pool.size})")
+                    return True
+            self.close()
+            return False
+        except (Error, PoolTimeoutError) as e:
             print(f"❌ Error connecting to MySQL: {e}")
+            self.pool = None
             return False
 
-    def execute_query(self, query, params=None):
-        """Execute a SELECT query and return results"""
+    def is_connected(self):
+        """Whether a connection pool is available"""
+        return self.pool is not None
+
+    def execute_query(self, query, params=None, deadline=None):
+        """Execute a SELECT query and return results.
+
+        Parameterized queries run as server-side prepared statements, reused
+        per connection for as long as the template stays cached.
+
+        With a ``deadline`` the pool checkout waits no longer than the time
+        left, and the server is told (MAX_EXECUTION_TIME) to abort the query
+        when it runs out; either raises QueryTimeoutError. The connection of
+        an aborted query stays healthy and goes back to the pool.
+        """
+        if self.pool is None:
+            print("❌ Error executing query: not connected")
+            return None
+
+        # A connection the server dropped fails with an Operational/Interface
+        # error; the pool discards it, so one retry gets a fresh connection.
+        for attempt in range(2):
+            if deadline is not None and deadline.expired():
+                raise QueryTimeoutError("Request deadline passed before the query ran")
+            timeout = deadline.bound(self.pool.timeout) if deadline is not None else None
+            try:
+                with self.pool.connection(timeout) as conn:
+                    conn.set_max_execution_time(_execution_time_ms(deadline))
+                    if params:
+                        template, cursor = conn.prepared(query)
+                        cursor.execute(template, tuple(params))
+                        return cursor.fetchall()
+                    cursor = conn.cursor(dictionary=True)
+                    try:
+                        cursor.execute(query)
+                        return cursor.fetchall()
+                    finally:
+                        cursor.close()
+            except (OperationalError, InterfaceError) as e:
+                if attempt == 0:
+                    continue
+                print(f"❌ Error executing query: {e}")
+                return None
+            except PoolTimeoutError as e:
+                if deadline is not None and deadline.expired():
+                    raise QueryTimeoutError("Timed out waiting for a database connection") from e
+                print(f"❌ Error executing query: {e}")
+                return None
+            except Error as e:
+                if e.errno == ER_QUERY_TIMEOUT:
+                    raise QueryTimeoutError("Query exceeded its execution time limit") from e
+                print(f"❌ Error executing query: {e}")
+                return None
+
+    def stream_query(self, query, params=None, batch_size=500, deadline=None):
+        """Yield the rows of a SELECT query without buffering the result set.
+
+        Uses an unbuffered cursor, so only ``batch_size`` rows are held in
+        memory at a time and the connection stays checked out until the
+        generator is exhausted or closed. A consumer that stops early leaves
+        unread rows on the wire; that connection is dropped rather than
+        drained. A ``deadline`` bounds checkout and execution as in
+        execute_query.
+        """
+        if self.pool is None:
+            raise PoolTimeoutError("Not connected to the database")
+
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            results = cursor.fetchall()
-            cursor.close()
-            return results
+            conn = self.pool.acquire(
+                deadline.bound(self.pool.timeout) if deadline is not None else None)
+        except PoolTimeoutError as e:
+            if deadline is not None and deadline.expired():
+                raise QueryTimeoutError("Timed out waiting for a database connection") from e
+            raise
+        broken = True
+        try:
+            conn.set_max_execution_time(_execution_time_ms(deadline))
+            cursor = conn.cursor(dictionary=True, buffered=False)
+            try:
+                cursor.execute(query, params or ())
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield from rows
+                broken = False
+            finally:
+                if not broken:
+                    cursor.close()
         except Error as e:
-            print(f"❌ Error executing query: {e}")
-            return None
+            if e.errno == ER_QUERY_TIMEOUT:
+                raise QueryTimeoutError("Query exceeded its execution time limit") from e
+            raise
+        finally:
+            self.pool.release(conn, broken=broken)
 
     def get_table_schema(self, table_name):
         """Get column information for a table"""
@@ -51,8 +382,117 @@ class DatabaseManager:
             return [list(table.values())[0] for table in results]
         return []
 
+    def get_schema(self, tables=None):
+        """Load every table's columns in one round trip.
+
+        Returns ``{table: [{'name', 'type', 'data_type', 'key', 'indexed'},
+        ...]}`` with columns in ordinal order, or None if the query failed.
+        ``indexed`` is true when the column leads some index, i.e. an equality
+        or range filter on it alone can use that index. ``tables`` limits the
+        load to those tables.
+        """
+        query = (
+            "SELECT c.TABLE_NAME AS table_name, c.COLUMN_NAME AS column_name, "
+            "c.COLUMN_TYPE AS column_type, c.DATA_TYPE AS data_type, "
+            "c.COLUMN_KEY AS column_key, "
+            "EXISTS (SELECT 1 FROM information_schema.STATISTICS s "
+            "WHERE s.TABLE_SCHEMA = c.TABLE_SCHEMA AND s.TABLE_NAME = c.TABLE_NAME "
+            "AND s.COLUMN_NAME = c.COLUMN_NAME AND s.SEQ_IN_INDEX = 1) AS is_indexed "
+            "FROM information_schema.COLUMNS c "
+            "WHERE c.TABLE_SCHEMA = DATABASE() "
+        )
+        params = []
+        if tables:
+            query += f"AND c.TABLE_NAME IN ({', '.join(['%s'] * len(tables))}) "
+            params = list(tables)
+        query += "ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION"
+        results = self.execute_query(query, params or None)
+        if results is None:
+            return None
+        schema = {}
+        for row in results:
+            schema.setdefault(row['table_name'], []).append({
+                'name': row['column_name'],
+                'type': row['column_type'],
+                'data_type': row['data_type'],
+                'key': row['column_key'],
+                'indexed': bool(row['is_indexed'])
+            })
+        return schema
+
+    def explain_rows(self, query, params=None, deadline=None):
+        """The optimizer's estimate of the rows a query examines (the largest
+        ``rows`` figure of its EXPLAIN), or None if EXPLAIN failed"""
+        results = self.execute_query(f"EXPLAIN {query}", params, deadline)
+        if not results:
+            return None
+        estimates = [int(row['rows']) for row in results if row.get('rows') is not None]
+        return max(estimates) if estimates else 0
+
+    def estimate_row_count(self, table_name):
+        """InnoDB's row estimate for a table from information_schema.TABLES.
+
+        Costs no scan, but can be off by a wide margin; None if unknown.
+        """
+        query = (
+            "SELECT TABLE_ROWS AS table_rows FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+        )
+        results = self.execute_query(query, [table_name])
+        if not results or results[0]['table_rows'] is None:
+            return None
+        return int(results[0]['table_rows'])
+
+    def estimate_row_counts(self, tables=None):
+        """InnoDB's row estimates of every table (or just ``tables``) in one
+        information_schema query: ``{table: rows}``, tables without an
+        estimate left out; None if the query failed"""
+        query = (
+            "SELECT TABLE_NAME AS table_name, TABLE_ROWS AS table_rows "
+            "FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE()"
+        )
+        params = []
+        if tables:
+            query += f" AND TABLE_NAME IN ({', '.join(['%s'] * len(tables))})"
+            params = list(tables)
+        results = self.execute_query(query, params or None)
+        if results is None:
+            return None
+        return {row['table_name']: int(row['table_rows'])
+                for row in results if row['table_rows'] is not None}
+
+    def schema_fingerprints(self):
+        """A cheap checksum of every table's column definitions.
+
+        Returns ``{table: fingerprint}``, or None if the query failed. A
+        fingerprint changes when a column of the table is added, dropped,
+        renamed, retyped, reordered or gains or loses a key, so comparing
+        two calls tells which tables need their schema loaded again.
+        """
+        query = (
+            "SELECT TABLE_NAME AS table_name, "
+            "BIT_XOR(CRC32(CONCAT_WS(':', ORDINAL_POSITION, COLUMN_NAME, "
+            "COLUMN_TYPE, COLUMN_KEY))) AS fingerprint "
+            "FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() "
+            "GROUP BY TABLE_NAME"
+        )
+        results = self.execute_query(query)
+        if results is None:
+            return None
+        return {row['table_name']: int(row['fingerprint']) for row in results}
+
+    def schema_identity(self):
+        """Identify the database whose schema is loaded (for snapshot reuse)"""
+        return f"{Config.MYSQL_HOST}:{Config.MYSQL_PORT}/{Config.MYSQL_DATABASE}"
+
+    def pool_stats(self):
+        """Return connection pool occupancy, or None when not connected"""
+        return self.pool.stats() if self.pool else None
+
     def close(self):
-        """Close database connection"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            print("🧹 MySQL connection closed")
+        """Close all pooled database connections"""
+        if self.pool:
+            self.pool.close()
+            self.pool = None
+            print("🧹 MySQL connection pool closed")
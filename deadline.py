@@ -0,0 +1,30 @@
+import time
+
+
+class Deadline:
+    """Time budget of one request, shared by every step that serves it.
+
+    ``seconds`` of None or 0 means no deadline: ``remaining()`` is then None
+    and the deadline never expires.
+    """
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds if seconds and seconds > 0 else None
+        self.expires_at = (time.monotonic() + self.seconds
+                           if self.seconds is not None else None)
+
+    def remaining(self):
+        """Seconds left (never negative), or None without a deadline"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def bound(self, timeout):
+        """``timeout`` shortened to what is left of the deadline"""
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return remaining if timeout is None else min(timeout, remaining)
@@ -0,0 +1,227 @@
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+from database import QueryTimeoutError
+_PLACEHOLDER = re.compile(r'%s')
+
+FIRST_NAMES = ['John', 'Jane', 'Alice', 'Bob', 'Carol', 'David', 'Eve', 'Frank',
+               'Grace', 'Henry', 'Irene', 'Jack']
+LAST_NAMES = ['Doe', 'Smith', 'Brown', 'Jones', 'Miller', 'Davis', 'Wilson', 'Moore']
+DEPARTMENTS = ['sales', 'engineering', 'marketing', 'finance', 'support', 'hr']
+CATEGORIES = ['electronics', 'furniture', 'stationery', 'kitchen', 'garden', 'toys']
+STATUSES = ['pending', 'shipped', 'delivered', 'cancelled']
+
+# Words used to name the synthetic tables and columns of wide schemas
+FILLER_WORDS = ['account', 'invoice', 'shipment', 'supplier', 'warehouse', 'region',
+                'payment', 'refund', 'ticket', 'campaign', 'contract', 'vendor',
+                'budget', 'asset', 'project', 'task', 'branch', 'carrier', 'coupon',
+                'review', 'session', 'device', 'license', 'policy']
+
+
+def _base_tables(rng, rows):
+    """Definitions and rows of the core fixture tables"""
+    employees = [
+        (i, f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+         rng.choice(DEPARTMENTS), rng.randrange(30000, 150000, 500),
+         f'user{i}@example.com', f'20{rng.randint(10, 23)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}')
+        for i in range(1, rows + 1)
+    ]
+    products = [
+        (i, f'product {i}', rng.choice(CATEGORIES), round(rng.uniform(5, 2000), 2),
+         rng.randint(0, 500))
+        for i in range(1, rows + 1)
+    ]
+    orders = [
+        (i, rng.randint(1, rows), rng.randint(1, rows), rng.randint(1, 10),
+         round(rng.uniform(5, 5000), 2), rng.choice(STATUSES))
+        for i in range(1, rows + 1)
+    ]
+    return {
+        'employees': ([('id', 'int', 'PRI'), ('name', 'varchar(100)', ''),
+                       ('department', 'varchar(50)', 'MUL'), ('salary', 'int', ''),
+                       ('email', 'varchar(100)', 'UNI'), ('hire_date', 'date', '')],
+                      employees),
+        'products': ([('id', 'int', 'PRI'), ('name', 'varchar(100)', ''),
+                      ('category', 'varchar(50)', 'MUL'), ('price', 'decimal(10,2)', ''),
+                      ('stock_quantity', 'int', '')],
+                     products),
+        'orders': ([('id', 'int', 'PRI'), ('employee_id', 'int', 'MUL'),
+                    ('product_id', 'int', 'MUL'), ('quantity', 'int', ''),
+                    ('total_amount', 'decimal(10,2)', ''), ('status', 'varchar(20)', '')],
+                   orders),
+    }
+
+
+def _wide_tables(rng, width, columns, rows):
+    """``width`` synthetic tables of ``columns`` columns each"""
+    tables = {}
+    for t in range(width):
+        name = f'{rng.choice(FILLER_WORDS)}_{rng.choice(FILLER_WORDS)}_{t}'
+        cols = [('id', 'int', 'PRI')]
+        for c in range(columns - 1):
+            kind = rng.choice(['int', 'varchar(50)'])
+            cols.append((f'{rng.choice(FILLER_WORDS)}_{c}', kind, ''))
+        data = [
+            tuple([i] + [rng.randint(0, 1000) if kind == 'int' else rng.choice(FILLER_WORDS)
+                         for _, kind, _ in cols[1:]])
+            for i in range(1, rows + 1)
+        ]
+        tables[name] = (cols, data)
+    return tables
+
+
+class FakeDatabaseManager:
+    """DatabaseManager look-alike backed by an in-memory SQLite fixture, so
+    the whole chatbot pipeline runs without a MySQL server.
+
+    ``width`` adds that many synthetic tables (of ``columns`` columns) next to
+    the employees/products/orders fixture, to exercise wide schemas.
+    ``latency`` and ``jitter`` (seconds) simulate the network and server time
+    of a real database: every query sleeps ``latency`` plus a uniform random
+    extra of up to ``jitter``, without holding the fixture lock. A query
+    whose delay outlasts its deadline raises QueryTimeoutError, as MySQL's
+    MAX_EXECUTION_TIME would.
+    """
+
+    def __init__(self, width=0, columns=8, rows=200, seed=42, latency=0.0, jitter=0.0):
+        self.width = width
+        self.columns = columns
+        self.rows = rows
+        self.seed = seed
+        self.latency = latency
+        self.jitter = jitter
+        self.queries = 0
+        self._conn = None
+        self._schema = {}
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """Create and fill the in-memory fixture database"""
+        rng = random.Random(self.seed)
+        tables = _base_tables(rng, self.rows)
+        tables.update(_wide_tables(rng, self.width, self.columns, min(self.rows, 50)))
+
+        self._conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        for table, (cols, data) in tables.items():
+            ddl = ', '.join(f'`{name}` {kind}' + (' PRIMARY KEY' if key == 'PRI' else '')
+                            for name, kind, key in cols)
+            self._conn.execute(f'CREATE TABLE `{table}` ({ddl})')
+            marks = ', '.join('?' for _ in cols)
+            self._conn.executemany(f'INSERT INTO `{table}` VALUES ({marks})', data)
+            for name, kind, key in cols:
+                if key in ('MUL', 'UNI'):
+                    self._conn.execute(f'CREATE INDEX `ix_{table}_{name}` ON `{table}` (`{name}`)')
+            self._schema[table] = [
+                {'name': name, 'type': kind, 'data_type': kind.split('(')[0], 'key': key,
+                 'indexed': key in ('PRI', 'MUL', 'UNI')}
+                for name, kind, key in cols
+            ]
+        self._conn.commit()
+        return True
+
+    def is_connected(self):
+        return self._conn is not None
+
+    def _simulate_latency(self, deadline=None):
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        remaining = deadline.remaining() if deadline is not None else None
+        if remaining is not None and delay >= remaining:
+            time.sleep(remaining)
+            raise QueryTimeoutError("Query exceeded its execution time limit")
+        if delay > 0:
+            time.sleep(delay)
+
+    def _execute(self, query, params):
+        self.queries += 1
+        query = _PLACEHOLDER.sub('?', query)
+        return self._conn.execute(query, tuple(params or ()))
+
+    def execute_query(self, query, params=None, deadline=None):
+        """Execute a SELECT query and return results"""
+        self._simulate_latency(deadline)
+        try:
+            with self._lock:
+                cursor = self._execute(query, params)
+                return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"❌ Error executing query: {e}")
+            return None
+
+    def stream_query(self, query, params=None, batch_size=500, deadline=None):
+        """Yield result rows in batches of ``batch_size``"""
+        self._simulate_latency(deadline)
+        with self._lock:
+            rows = [dict(row) for row in self._execute(query, params).fetchall()]
+        for start in range(0, len(rows), batch_size):
+            yield from rows[start:start + batch_size]
+
+    def get_schema(self, tables=None):
+        return {table: [dict(col) for col in cols] for table, cols in self._schema.items()
+                if tables is None or table in tables}
+
+    def schema_fingerprints(self):
+        """Checksum of each table's column definitions, as the real one"""
+        return {
+            table: zlib.crc32(json.dumps(cols, sort_keys=True).encode('utf-8'))
+            for table, cols in self._schema.items()
+        }
+
+    def estimate_row_count(self, table_name):
+        """Row count standing in for information_schema's estimate"""
+        if table_name not in self._schema:
+            return None
+        self._simulate_latency()
+        with self._lock:
+            return self._conn.execute(f'SELECT COUNT(*) FROM `{table_name}`').fetchone()[0]
+
+    def estimate_row_counts(self, tables=None):
+        """Row counts of every table (or just ``tables``) in one round trip"""
+        self._simulate_latency()
+        with self._lock:
+            return {
+                table: self._conn.execute(f'SELECT COUNT(*) FROM `{table}`').fetchone()[0]
+                for table in self._schema if tables is None or table in tables
+            }
+
+    def explain_rows(self, query, params=None, deadline=None):
+        """Rough stand-in for MySQL's EXPLAIN row estimate: a full scan
+        examines the whole table, an index search a tenth of it"""
+        self._simulate_latency(deadline)
+        with self._lock:
+            try:
+                steps = self._execute(f'EXPLAIN QUERY PLAN {query}', params).fetchall()
+            except sqlite3.Error:
+                return None
+            estimate = 0
+            for step in steps:
+                detail = step['detail']
+                table = next((t for t in self._schema if f' {t}' in detail), None)
+                if table is None:
+                    continue
+                rows = self._conn.execute(f'SELECT COUNT(*) FROM `{table}`').fetchone()[0]
+                estimate = max(estimate, rows if detail.startswith('SCAN') else rows // 10)
+            return estimate
+
+    def schema_identity(self):
+        return f'fake://{self.width}x{self.columns}/{self.rows}/{self.seed}'
+
+    def get_table_schema(self, table_name):
+        return [{'Field': col['name'], 'Type': col['type'], 'Key': col['key']}
+                for col in self._schema.get(table_name, [])]
+
+    def get_all_tables(self):
+        return list(self._schema)
+
+    def pool_stats(self):
+        return {'size': 1, 'open': 1, 'idle': 1, 'in_use': 0}
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,188 @@
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from fuzzywuzzy import fuzz
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+# Cache lookups tell a memoized None apart from a miss with this
+_MISSING = object()
+
+
+def _normalize(name):
+    """Lowercase and collapse separators: 'Stock_Quantity' -> 'stock quantity'"""
+    return _NON_ALNUM.sub(' ', name.lower()).strip()
+
+
+def _ngrams(text, n):
+    padded = f' {text} '
+    return {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+
+
+class FuzzyIndex:
+    """Fuzzy lookup of keywords among a fixed list of schema names.
+
+    Exact and near-exact hits (case, separators, a trailing plural 's') are
+    resolved with one dict lookup. The remaining keywords of a batch are
+    scored against every name at once: a keyword x name Dice similarity over
+    character n-grams, computed as one NumPy matrix product. Only the top few
+    names per keyword are then confirmed with ``fuzz.token_sort_ratio``.
+    Results are memoized per keyword in an LRU of ``cache_size`` entries.
+
+    With ``prefer=True`` a name in ``preferred`` (e.g. indexed columns) wins
+    over a better-scoring one when it trails by at most ``tie_margin`` points.
+    """
+
+    def __init__(self, names, ngram=2, verify=5, cache_size=4096, preferred=(),
+                 tie_margin=5):
+        self.names = list(names)
+        self.preferred = frozenset(preferred)
+        self.tie_margin = tie_margin
+        self.ngram = ngram
+        self.verify = verify
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._normalized = [_normalize(name) for name in self.names]
+
+        self._exact = {}
+        for name, norm in zip(self.names, self._normalized):
+            self._exact.setdefault(norm, name)
+        for name, norm in zip(self.names, self._normalized):
+            for variant in self._variants(norm):
+                self._exact.setdefault(variant, name)
+
+        # Binary name x n-gram incidence matrix
+        name_grams = [_ngrams(norm, ngram) for norm in self._normalized]
+        self._vocab = {}
+        for grams in name_grams:
+            for gram in grams:
+                self._vocab.setdefault(gram, len(self._vocab))
+        self._matrix = np.zeros((len(self.names), len(self._vocab)), dtype=np.float32)
+        for row, grams in enumerate(name_grams):
+            self._matrix[row, [self._vocab[g] for g in grams]] = 1.0
+        self._sizes = np.array([len(g) for g in name_grams], dtype=np.float32)
+
+        # Word -> the names containing it, for match_word
+        self._words = {}
+        for name, norm in zip(self.names, self._normalized):
+            for word in norm.split():
+                for variant in {word} | self._variants(word):
+                    self._words.setdefault(variant, set()).add(name)
+
+    @staticmethod
+    def _variants(norm):
+        """Near-exact spellings that should resolve to the same name"""
+        compact = norm.replace(' ', '')
+        variants = {compact}
+        for form in (norm, compact):
+            if form.endswith('s'):
+                variants.add(form[:-1])
+            else:
+                variants.add(form + 's')
+        return variants
+
+    def match(self, keyword, threshold=60, prefer=False):
+        """Best matching name for ``keyword`` scoring at least ``threshold``"""
+        return self.match_many([keyword], threshold, prefer)[0]
+
+    def match_word(self, keyword):
+        """The one name having ``keyword`` as a whole word ('stock' ->
+        'stock_quantity'), or None when no name or several do.
+
+        For a keyword too short a part of the name to pass a fuzzy
+        threshold, where a looser threshold would match unrelated names.
+        """
+        names = self._words.get(_normalize(keyword), ())
+        return next(iter(names)) if len(names) == 1 else None
+
+    def match_many(self, keywords, threshold=60, prefer=False):
+        """Best matching name (or None) for each keyword, in input order"""
+        prefer = prefer and bool(self.preferred)
+        results = [None] * len(keywords)
+        pending = []
+        for i, keyword in enumerate(keywords):
+            key = (keyword, threshold, prefer)
+            cached = self._cached(key)
+            if cached is not _MISSING:
+                results[i] = cached
+                continue
+            norm = _normalize(keyword)
+            if not norm or not self.names:
+                self._remember(key, None)
+                continue
+            exact = self._exact.get(norm) or self._exact.get(norm.replace(' ', ''))
+            if exact is not None:
+                results[i] = exact
+                self._remember(key, exact)
+                continue
+            pending.append((i, key, norm))
+
+        if pending:
+            similarity = self._similarity([norm for _, _, norm in pending])
+            for row, (i, key, norm) in enumerate(pending):
+                results[i] = self._best(norm, similarity[row], threshold, prefer)
+                self._remember(key, results[i])
+        return results
+
+    def _similarity(self, norms):
+        """Keyword x name Dice coefficients over character n-grams"""
+        keyword_matrix = np.zeros((len(norms), len(self._vocab)), dtype=np.float32)
+        keyword_sizes = np.empty(len(norms), dtype=np.float32)
+        for row, norm in enumerate(norms):
+            grams = _ngrams(norm, self.ngram)
+            keyword_sizes[row] = len(grams)
+            columns = [self._vocab[g] for g in grams if g in self._vocab]
+            keyword_matrix[row, columns] = 1.0
+        overlap = keyword_matrix @ self._matrix.T
+        return 2.0 * overlap / (keyword_sizes[:, None] + self._sizes[None, :])
+
+    def _best(self, norm, similarity_row, threshold, prefer=False):
+        """Confirm the top Dice candidates with token_sort_ratio"""
+        if len(similarity_row) > self.verify:
+            # Stable sort keeps the earlier name first on ties, like extractOne
+            top = np.argsort(-similarity_row, kind='stable')[:self.verify]
+            candidates = sorted(int(i) for i in top)
+        else:
+            candidates = range(len(similarity_row))
+
+        best_name, best_score = None, -1
+        scores = []
+        for index in candidates:
+            score = fuzz.token_sort_ratio(norm, self._normalized[index])
+            scores.append((index, score))
+            if score > best_score:
+                best_name, best_score = self.names[index], score
+        if prefer and best_name not in self.preferred:
+            floor = max(best_score - self.tie_margin, threshold)
+            close = [(score, -index) for index, score in scores
+                     if score >= floor and self.names[index] in self.preferred]
+            if close:
+                best_score, index = max(close)
+                best_name = self.names[-index]
+        if best_score >= threshold:
+            return best_name
+        return None
+
+    def _cached(self, key):
+        with self._cache_lock:
+            value = self._cache.get(key, _MISSING)
+            if value is not _MISSING:
+                self._cache.move_to_end(key)
+            return value
+
+    def _remember(self, key, value):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def clear_cache(self):
+        """Forget every memoized match"""
+        with self._cache_lock:
+            self._cache.clear()
@@ -0,0 +1,94 @@
+import re
+from functools import lru_cache
+
+# When several intents match, the most specific query shape wins. Intents
+# not listed here rank after these, in intent_patterns order.
+INTENT_PRIORITY = ['top_n', 'aggregate', 'count', 'filter_numeric', 'filter_text',
+                   'select_all', 'specific_field']
+
+# Sub-phrases that entity extraction and SQL generation need, matched in the
+# same scan as the intents (on lowercased text)
+SLOT_PATTERNS = {
+    'numeric_filter': r'(\w+)\s+(under|over|less than|greater than|above|below|>|<|>=|<=)\s+(\d+)',
+    'text_filter': r'(\w+)\s*(?:=|is|equals?|are)\s+["\']?(\w+)["\']?',
+    'greater': r'(greater than|more than|above|>)',
+    'less': r'(less than|below|under|<)',
+    'aggregate': r'\b(average|avg|mean|sum|total|minimum|min|lowest|smallest|maximum|max|highest|largest)\s+(?:of\s+)?(?:the\s+)?(?:all\s+)?(\w+)',
+    'group_by': r'\b(?:group(?:ed)? by|by|per|for each|for every|in each)\s+(\w+)',
+    'top_n': r'\b(top|bottom)\s+(\d+)\b',
+    'n_superlative': r'\b(\d+)\s+(highest|lowest|largest|smallest|biggest|cheapest|most expensive|most|least)\b',
+}
+
+# Patterns that must see the original text (case or punctuation matters)
+NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+QUOTED_PATTERN = re.compile(r'["\']+(.*?)["\']')
+NAME_REF_PATTERN = re.compile(r'(?:of|for)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)')
+
+
+class IntentEngine:
+    """Precompiled matcher for all intent and slot patterns.
+
+    Every pattern is wrapped in an optional lookahead and joined into one
+    regex, so a single ``match`` call reports each pattern's leftmost match
+    and capture groups, exactly as a separate ``re.search`` per pattern would.
+    """
+
+    def __init__(self, intent_patterns, slot_patterns=None, cache_size=1024):
+        slot_patterns = SLOT_PATTERNS if slot_patterns is None else slot_patterns
+        self._entries = []
+        parts = []
+        group = 1
+        for intent, patterns in intent_patterns.items():
+            for index, pattern in enumerate(patterns):
+                group = self._add(parts, ('intent', intent, index), pattern, group)
+        self._slot_names = list(slot_patterns)
+        for slot, pattern in slot_patterns.items():
+            group = self._add(parts, ('slot', slot, None), pattern, group)
+        self._combined = re.compile('^' + ''.join(parts))
+
+        order = list(intent_patterns)
+        self._rank = {
+            intent: (INTENT_PRIORITY.index(intent) if intent in INTENT_PRIORITY
+                     else len(INTENT_PRIORITY) + order.index(intent))
+            for intent in order
+        }
+        self.analyze = lru_cache(maxsize=cache_size)(self._analyze)
+
+    def _add(self, parts, key, pattern, group):
+        inner_groups = re.compile(pattern).groups
+        parts.append(f'(?:(?=(?s:.*?)({pattern})))?')
+        self._entries.append((key, group, inner_groups))
+        return group + 1 + inner_groups
+
+    def _analyze(self, text):
+        """Scan ``text`` once and return its intents and slots.
+
+        The result is cached and shared between callers, so treat it as
+        read-only. ``matches`` lists every matching intent pattern, best
+        first; ``intent`` is the best one or 'unknown'.
+        """
+        text_lower = text.lower()
+        found = self._combined.match(text_lower)
+
+        matches = []
+        slots = {name: None for name in self._slot_names}
+        for (kind, name, index), group, inner_groups in self._entries:
+            if found.group(group) is None:
+                continue
+            groups = tuple(found.group(group + 1 + i) for i in range(inner_groups))
+            if kind == 'intent':
+                matches.append({'intent': name, 'pattern': index, 'groups': groups})
+            else:
+                slots[name] = groups
+        matches.sort(key=lambda m: self._rank[m['intent']])
+
+        name_ref = NAME_REF_PATTERN.search(text)
+        slots['numbers'] = NUMBER_PATTERN.findall(text)
+        slots['quoted'] = QUOTED_PATTERN.findall(text)
+        slots['name_ref'] = name_ref.group(1) if name_ref else None
+
+        return {
+            'intent': matches[0]['intent'] if matches else 'unknown',
+            'matches': matches,
+            'slots': slots
+        }
@@ -0,0 +1,193 @@
+"""End-to-end load generator for the Flask app.
+
+Replays a corpus of realistic questions against /api/chat at a chosen
+concurrency and (optionally) request rate, and reports throughput, latency
+percentiles and error rate. By default the app is served in-process on top
+of FakeDatabaseManager with simulated query latency:
+
+    python load_test.py --concurrency 16 --duration 30 --latency-ms 5 --jitter-ms 10
+    python load_test.py --rate 200 --duration 60 --output load.json
+    python load_test.py --url http://localhost:5000 --concurrency 32   # a running server
+
+With --rate, requests are sent on a fixed schedule and latency is measured
+from the scheduled send time, so a saturated server shows up as queueing
+delay instead of being hidden by the load generator slowing down.
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+
+from benchmark import build_corpus, summarize
+from config import Config
+from fake_database import FakeDatabaseManager
+
+
+def start_local_server(width, latency, jitter):
+    """Serve app.py on an ephemeral port backed by the fake database;
+    returns ``(base_url, server)``"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    # Keep the real database out of it: no warm-up, no schema snapshot
+    Config.WARMUP_ON_START = False
+    Config.SCHEMA_SNAPSHOT_PATH = ''
+
+    import app as app_module
+    from chatbot_core import Chatbot
+
+    app_module.chatbot = Chatbot(db=FakeDatabaseManager(width=width, latency=latency,
+                                                        jitter=jitter))
+    if not app_module.chatbot.initialize():
+        raise RuntimeError("Failed to initialize chatbot against the fake database")
+
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True,
+                         request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, name='load-test-server',
+                     daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server
+
+
+def send(url, message, timeout):
+    """POST one question; returns ``(ok, answered)``: ``ok`` is a 2xx HTTP
+    response, ``answered`` whether the chatbot reported success"""
+    body = json.dumps({'message': message}).encode('utf-8')
+    req = urllib.request.Request(url, data=body,
+                                 headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            payload = json.loads(resp.read())
+        return True, bool(payload.get('success'))
+    except (urllib.error.URLError, OSError, ValueError):
+        return False, False
+
+
+def run_load(url, corpus, concurrency, duration, rate, timeout):
+    """Drive ``concurrency`` workers for ``duration`` seconds"""
+    questions = itertools.cycle(corpus)
+    sequence = itertools.count()
+    lock = threading.Lock()
+    latencies = []
+    counts = {'requests': 0, 'errors': 0, 'unanswered': 0}
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def worker():
+        while True:
+            with lock:
+                index = next(sequence)
+                message = next(questions)
+            if rate:
+                scheduled = start + index / rate
+                if scheduled >= deadline:
+                    return
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                scheduled = time.perf_counter()
+                if scheduled >= deadline:
+                    return
+            ok, answered = send(url, message, timeout)
+            elapsed = time.perf_counter() - scheduled
+            with lock:
+                counts['requests'] += 1
+                if not ok:
+                    counts['errors'] += 1
+                else:
+                    latencies.append(elapsed)
+                    if not answered:
+                        counts['unanswered'] += 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    total = counts['requests']
+    report = {
+        'requests': total,
+        'wall_seconds': round(wall, 3),
+        'throughput_rps': round(total / wall, 1) if wall else None,
+        'error_rate': round(counts['errors'] / total, 4) if total else None,
+        'errors': counts['errors'],
+        'unanswered': counts['unanswered'],
+    }
+    if latencies:
+        report['latency'] = summarize(latencies)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='base URL of a running server '
+                                      '(default: serve app.py in-process on the fake database)')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='concurrent client workers')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='target requests per second (0: as fast as the workers go)')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='seconds to run')
+    parser.add_argument('--corpus', type=int, default=500,
+                        help='distinct questions to replay')
+    parser.add_argument('--latency-ms', type=float, default=2,
+                        help='simulated database latency per query')
+    parser.add_argument('--jitter-ms', type=float, default=3,
+                        help='uniform random extra database latency')
+    parser.add_argument('--width', type=int, default=0,
+                        help='extra synthetic tables in the fake schema')
+    parser.add_argument('--timeout', type=float, default=30,
+                        help='per-request timeout in seconds')
+    parser.add_argument('--output', help='also save the report as JSON')
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        base_url, server = start_local_server(args.width, args.latency_ms / 1000,
+                                              args.jitter_ms / 1000)
+
+    print(f"🚀 {args.concurrency} workers, "
+          f"{f'{args.rate:g} req/s' if args.rate else 'open throttle'}, "
+          f"{args.duration:g}s against {base_url}")
+    report = run_load(f'{base_url}/api/chat', build_corpus(args.corpus),
+                      args.concurrency, args.duration, args.rate, args.timeout)
+    if server is not None:
+        server.shutdown()
+
+    latency = report.get('latency', {})
+    print(f"requests     {report['requests']}")
+    print(f"throughput   {report['throughput_rps']} req/s")
+    print(f"latency p50  {latency.get('p50_us', 0) / 1000:.2f} ms")
+    print(f"latency p99  {latency.get('p99_us', 0) / 1000:.2f} ms")
+    print(f"error rate   {(report['error_rate'] or 0) * 100:.2f}% "
+          f"({report['errors']} errors, {report['unanswered']} unanswered)")
+
+    if args.output:
+        report['meta'] = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'url': args.url,
+            'concurrency': args.concurrency,
+            'rate': args.rate,
+            'duration': args.duration,
+            'db_latency_ms': None if args.url else args.latency_ms,
+            'db_jitter_ms': None if args.url else args.jitter_ms,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved report to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+
+def _exponential_buckets(start, factor, count):
+    return [start * factor ** i for i in range(count)]
+
+
+# 50us .. ~110s, 1.5x apart: quantiles are accurate to within one bucket
+DEFAULT_BUCKETS = _exponential_buckets(0.00005, 1.5, 37)
+# 1 .. ~16M, for sizes such as row counts
+COUNT_BUCKETS = _exponential_buckets(1, 2, 25)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Fixed-bucket histogram; observing is one bisect and two additions"""
+
+    def __init__(self, buckets=None):
+        self.buckets = list(buckets or DEFAULT_BUCKETS)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside the bucket holding it,
+        clamped to the smallest and largest values observed"""
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+            low, high = self.min, self.max
+        if total == 0:
+            return 0.0
+        rank = q * total
+        seen = 0
+        estimate = high
+        for index, bucket_count in enumerate(counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else high
+                estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+                break
+            seen += bucket_count
+        return min(max(estimate, low), high)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    inner = ','.join(f'{k}="{v}"' for k, v in labels)
+    return '{' + inner + '}'
+
+
+class MetricsRegistry:
+    """Histograms, counters and gauges rendered in Prometheus text format.
+
+    Histograms are exported as summaries (p50/p95/p99, sum and count).
+    Gauges are callbacks evaluated at scrape time, so reading pool or cache
+    state costs nothing on the request path.
+    """
+
+    def __init__(self):
+        self._help = {}
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def _key(self, name, help_text, labels):
+        if help_text:
+            self._help.setdefault(name, help_text)
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, value, help_text=None, buckets=None, **labels):
+        """Record one observation in the histogram ``name``.
+
+        ``buckets`` only applies when the histogram is first created; the
+        default suits latencies in seconds.
+        """
+        key = self._key(name, help_text, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(buckets))
+        histogram.observe(value)
+
+    def inc(self, name, amount=1, help_text=None, **labels):
+        """Increase the counter ``name``"""
+        key = self._key(name, help_text, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def gauge(self, name, callback, help_text=None):
+        """Register a gauge whose value(s) come from ``callback()``.
+
+        The callback returns a number, or a dict mapping a label value tuple
+        ``((label, value), ...)`` to a number. Returning None skips it.
+        """
+        if help_text:
+            self._help[name] = help_text
+        self._gauges[name] = callback
+
+    @contextmanager
+    def timer(self, name, timings=None, help_text=None, **labels):
+        """Time a block into histogram ``name``; optionally also record the
+        elapsed milliseconds in ``timings`` under the first label value"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(name, elapsed, help_text, **labels)
+            if timings is not None:
+                label = next(iter(labels.values()), name)
+                timings[label] = round(elapsed * 1000, 3)
+
+    def quantile(self, name, q, **labels):
+        """Current quantile estimate for one histogram (0.0 if unseen)"""
+        histogram = self._histograms.get((name, tuple(sorted(labels.items()))))
+        return histogram.quantile(q) if histogram else 0.0
+
+    def render(self):
+        """Prometheus text exposition of every metric"""
+        lines = []
+        declared = set()
+
+        def declare(name, kind):
+            if name not in declared:
+                declared.add(name)
+                if name in self._help:
+                    lines.append(f'# HELP {name} {self._help[name]}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), histogram in sorted(self._histograms.items()):
+            declare(name, 'summary')
+            for q in QUANTILES:
+                q_labels = labels + (('quantile', q),)
+                lines.append(f'{name}{_format_labels(q_labels)} {histogram.quantile(q):.6g}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {histogram.sum:.6g}')
+            lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+
+        for (name, labels), value in sorted(self._counters.items()):
+            declare(name, 'counter')
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+
+        for name, callback in sorted(self._gauges.items()):
+            try:
+                value = callback()
+            except Exception:
+                continue
+            if value is None:
+                continue
+            declare(name, 'gauge')
+            if isinstance(value, dict):
+                for labels, item in sorted(value.items()):
+                    lines.append(f'{name}{_format_labels(labels)} {item}')
+            else:
+                lines.append(f'{name} {value}')
+
+        return '\n'.join(lines) + '\n'
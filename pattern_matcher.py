@@ -1,5 +1,60 @@
-import re
-from fuzzywuzzy import fuzz, process
+import threading
+
+from config import Config
+from fuzzy_index import FuzzyIndex
+from intent_engine import IntentEngine
+from schema_snapshot import load_snapshot, save_snapshot
+from value_index import ValueIndex
+
+NUMERIC_TYPES = frozenset({'int', 'integer', 'tinyint', 'smallint', 'mediumint', 'bigint',
+                           'decimal', 'numeric', 'float', 'double', 'real'})
+
+# Superlatives that rank rows from the smallest value up
+ASCENDING_WORDS = frozenset({'bottom', 'lowest', 'smallest', 'cheapest', 'least'})
+
+class SchemaState:
+    """A loaded schema and the lookup indexes derived from it.
+
+    Never changed after it is built: a schema change builds a new state and
+    swaps it in with one assignment, so a request always reads a complete
+    state. Passing the ``previous`` state reuses the column indexes of the
+    tables not listed in ``changed``.
+    """
+
+    def __init__(self, schema, version, previous=None, changed=(), value_index=None):
+        self.schema = schema
+        self.version = version
+        self.value_index = value_index if value_index is not None else ValueIndex()
+        self.table_mappings = {table: table for table in schema}
+        self.column_mappings = {table: [col['name'] for col in columns]
+                                for table, columns in schema.items()}
+
+        if previous is not None and previous.table_mappings.keys() == self.table_mappings.keys():
+            self.table_index = previous.table_index
+        else:
+            self.table_index = FuzzyIndex(self.table_mappings.keys())
+
+        self.column_indexes = {}
+        for table, columns in self.column_mappings.items():
+            if previous is not None and table not in changed and table in previous.column_indexes:
+                self.column_indexes[table] = previous.column_indexes[table]
+            else:
+                indexed = [col['name'] for col in schema[table] if col.get('indexed')]
+                self.column_indexes[table] = FuzzyIndex(columns, preferred=indexed,
+                                                        tie_margin=Config.INDEX_TIE_MARGIN)
+
+        # Every column name across tables, to find the table of a question
+        # that names only columns ("average salary by department")
+        column_tables = {}
+        for table, columns in self.column_mappings.items():
+            for column in columns:
+                column_tables.setdefault(column, []).append(table)
+        self.column_tables = column_tables
+        if previous is not None and previous.column_tables.keys() == column_tables.keys():
+            self.column_index = previous.column_index
+        else:
+            self.column_index = FuzzyIndex(column_tables.keys())
+
 
 class PatternMatcher:
     def __init__(self, db_manager):
@@ -35,105 +90,275 @@ class PatternMatcher:
                 r'(.*?) (where|in) (.*?) (=|is|equals?|are) ["\']?(.*?)["\']?$',
                 r'(.*?) where (.*?) = (.*)',
                 r'(.*?) in (.*?) category (.*)',
+            ],
+            'aggregate': [
+                r'\b(average|avg|mean|sum|minimum|min|maximum|max) (.*)',
+                r'^(?:what is |what\'s |show (?:me )?|get |give me )?(?:the )?total (?!number)(.*)',
+                r'\b(highest|lowest|largest|smallest) (.*)'
+            ],
+            'top_n': [
+                r'\b(top|bottom) (\d+)\b',
+                r'\b(\d+) (highest|lowest|largest|smallest|biggest|cheapest|most expensive|most|least)\b'
             ]
         }
         
-        self.table_mappings = {}
-        self.column_mappings = {}
+        self.intent_engine = IntentEngine(self.intent_patterns)
+        
+        self._state = SchemaState({}, 0)
+        self._swap_lock = threading.Lock()
         self._load_schema()
     
+    # Read-only views of the current SchemaState
+    @property
+    def schema(self):
+        return self._state.schema
+    
+    @property
+    def schema_version(self):
+        return self._state.version
+    
+    @property
+    def table_mappings(self):
+        return self._state.table_mappings
+    
+    @property
+    def column_mappings(self):
+        return self._state.column_mappings
+    
+    @property
+    def table_index(self):
+        return self._state.table_index
+    
+    @property
+    def column_indexes(self):
+        return self._state.column_indexes
+    
+    @property
+    def column_index(self):
+        return self._state.column_index
+    
+    @property
+    def column_tables(self):
+        return self._state.column_tables
+    
+    @property
+    def value_index(self):
+        return self._state.value_index
+    
     def _load_schema(self):
-        """Load database schema for fuzzy matching"""
-        tables = self.db_manager.get_all_tables()
-        for table in tables:
-            self.table_mappings[table] = table
-            schema = self.db_manager.get_table_schema(table)
+        """Load database schema for fuzzy matching.
+
+        Uses the on-disk snapshot (schema and value index) when it is still
+        valid, otherwise one bulk information_schema query and the value
+        scans (refreshing the snapshot).
+        """
+        identity = self.db_manager.schema_identity()
+        schema, values = load_snapshot(Config.SCHEMA_SNAPSHOT_PATH, identity,
+                                       Config.SCHEMA_SNAPSHOT_MAX_AGE)
+        if schema is not None:
+            value_index = ValueIndex.from_snapshot(values or [], schema,
+                                                   Config.VALUE_INDEX_MAX_BYTES)
+        else:
+            schema = self.db_manager.get_schema()
             if schema:
-                self.column_mappings[table] = [col['Field'] for col in schema]
+                value_index = self._build_value_index(schema)
+                save_snapshot(Config.SCHEMA_SNAPSHOT_PATH, identity, schema,
+                              value_index.to_snapshot())
+            else:
+                schema = self._describe_schema()
+                value_index = self._build_value_index(schema)
+        with self._swap_lock:
+            self._state = SchemaState(schema, self._state.version + 1,
+                                      value_index=value_index)
+    
+    def apply_schema_changes(self, changed):
+        """Swap in the new definitions of the tables in ``changed``.
+        
+        ``changed`` maps a table to its columns, or to None when the table
+        was dropped. Only those tables' column indexes are rebuilt; requests
+        in flight keep the state they started with. Returns the new schema
+        version.
+        """
+        with self._swap_lock:
+            current = self._state
+            schema = dict(current.schema)
+            for table, columns in changed.items():
+                if columns is None:
+                    schema.pop(table, None)
+                else:
+                    schema[table] = columns
+            value_index = self._build_value_index(schema, changed, current.value_index)
+            state = SchemaState(schema, current.version + 1, current, changed, value_index)
+            self._state = state
+        save_snapshot(Config.SCHEMA_SNAPSHOT_PATH, self.db_manager.schema_identity(), schema,
+                      value_index.to_snapshot())
+        return state.version
+    
+    def _build_value_index(self, schema, changed=None, previous=None):
+        """Distinct values of the low-cardinality text columns, reloading
+        only the ``changed`` tables of the ``previous`` index when given"""
+        return ValueIndex.build(self.db_manager, schema,
+                                max_bytes=Config.VALUE_INDEX_MAX_BYTES,
+                                max_distinct=Config.VALUE_INDEX_MAX_DISTINCT,
+                                scan_rows=Config.VALUE_INDEX_SCAN_ROWS,
+                                tables=changed, previous=previous)
+    
+    def _describe_schema(self):
+        """Fallback loader: SHOW TABLES plus one DESCRIBE per table"""
+        schema = {}
+        for table in self.db_manager.get_all_tables():
+            described = self.db_manager.get_table_schema(table) or []
+            schema[table] = [
+                {
+                    'name': col['Field'],
+                    'type': col['Type'],
+                    'data_type': col['Type'].split('(')[0].lower(),
+                    'key': col['Key'],
+                    'indexed': col['Key'] in ('PRI', 'UNI', 'MUL')
+                }
+                for col in described
+            ]
+        return schema
+    
+    def primary_key(self, table):
+        """The table's single-column primary key, or None"""
+        keys = [col['name'] for col in self.schema.get(table, []) if col.get('key') == 'PRI']
+        return keys[0] if len(keys) == 1 else None
+    
+    def indexed_columns(self, table):
+        """Columns of ``table`` that lead an index"""
+        return [col['name'] for col in self.schema.get(table, []) if col.get('indexed')]
+    
+    def is_numeric(self, table, column):
+        """Whether ``column`` of ``table`` holds numbers"""
+        for col in self.schema.get(table, []):
+            if col['name'] == column:
+                return col.get('data_type') in NUMERIC_TYPES
+        return False
     
     def detect_intent(self, text):
         """Detect user intent from text using pattern matching"""
-        text_lower = text.lower()
-        for intent, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, text_lower):
-                    return intent
-        return 'unknown'
+        return self.intent_engine.analyze(text)['intent']
+    
+    def match_intents(self, text):
+        """Return every matching intent with its capture groups, best first"""
+        return self.intent_engine.analyze(text)['matches']
     
     def fuzzy_match_table(self, keyword, threshold=60):
         """Find best matching table name using fuzzy matching"""
-        if not self.table_mappings:
-            return None
-        result = process.extractOne(keyword, self.table_mappings.keys(), 
-                                    scorer=fuzz.token_sort_ratio)
-        if result and result[1] >= threshold:
-            return result[0]
-        return None
-    
-    def fuzzy_match_column(self, table, keyword, threshold=60):
-        """Find best matching column name for a table"""
-        if table not in self.column_mappings:
+        return self.table_index.match(keyword, threshold)
+    
+    def fuzzy_match_column(self, table, keyword, threshold=60, prefer_indexed=False):
+        """Find best matching column name for a table.
+        
+        With ``prefer_indexed`` (for filter columns) an indexed column beats
+        a slightly better-scoring unindexed one, within Config.INDEX_TIE_MARGIN.
+        """
+        index = self.column_indexes.get(table)
+        if index is None:
             return None
-        columns = self.column_mappings[table]
-        result = process.extractOne(keyword, columns, 
-                                    scorer=fuzz.token_sort_ratio)
-        if result and result[1] >= threshold:
-            return result[0]
-        return None
-    
-    def extract_entities(self, text, keywords):
-        """Extract table names, column names, and values from text"""
+        return index.match(keyword, threshold, prefer_indexed)
+    
+    def extract_entities(self, text, keywords, table=None):
+        """Extract table names, column names, and values from text.
+        
+        A known ``table`` (e.g. the one a follow-up refers back to) is used
+        instead of looking for one in the text.
+        """
         entities = {
             'table': None,
             'columns': [],
             'filter_column': None,
             'filter_value': None,
             'filter_operator': '=',
-            'values': []
+            'values': [],
+            'aggregate': None,
+            'aggregate_column': None,
+            'group_by': None,
+            'order_by': None,
+            'order_direction': None,
+            'limit': None,
+            'filters': []
         }
         
         # Try to match table name - prioritize longer keywords (product vs duct)
-        keywords_sorted = sorted(keywords, key=len, reverse=True)
-        for keyword in keywords_sorted:
-            table = self.fuzzy_match_table(keyword)
-            if table:
-                entities['table'] = table
-                break
+        # All keywords are scored against all tables in one batch
+        if table is not None:
+            entities['table'] = table
+        else:
+            keywords_sorted = sorted(keywords, key=len, reverse=True)
+            tables = self.table_index.match_many(keywords_sorted)
+            entities['table'] = next((table for table in tables if table), None)
+        if not entities['table']:
+            entities['table'] = self._table_from_columns(keywords)
+        value_matches = self.value_index.find(text, entities['table'])
+        if not entities['table']:
+            entities['table'] = self._table_from_values(value_matches)
+        if not entities['table']:
+            entities['table'] = self._table_from_column_word(text)
         
         # If table found, match columns
         if entities['table']:
-            for keyword in keywords:
-                column = self.fuzzy_match_column(entities['table'], keyword)
-                if column:
-                    entities['columns'].append(column)
+            index = self.column_indexes.get(entities['table'])
+            if index is not None:
+                entities['columns'] = [
+                    column for column in index.match_many(keywords) if column
+                ]
+        
+        slots = self.intent_engine.analyze(text)['slots']
         
         # Extract numeric values
-        numbers = re.findall(r'\d+(?:\.\d+)?', text)
-        entities['values'] = numbers
+        entities['values'] = list(slots['numbers'])
         
         # Extract quoted strings (for name/category matching)
-        quoted = re.findall(r'["\']+(.*?)["\']', text)
-        entities['values'].extend(quoted)
+        entities['values'].extend(slots['quoted'])
         
         # Extract filter conditions
         entities = self._extract_filter_conditions(text, entities)
         
+        # Extract aggregation, grouping and ranking
+        entities = self._extract_aggregation(text, entities)
+        
+        # Fall back to a column value named on its own ("electronics products")
+        entities = self._extract_value_filter(value_matches, entities)
+        
         return entities
     
+    def _table_from_columns(self, keywords, threshold=85):
+        """The table owning most of the columns the keywords name closely"""
+        votes = {}
+        for column in self.column_index.match_many(keywords, threshold):
+            for table in self.column_tables.get(column, ()):
+                votes[table] = votes.get(table, 0) + 1
+        return max(votes, key=votes.get) if votes else None
+    
+    def _table_from_column_word(self, text):
+        """The table of the one column the aggregated word is part of
+        ('total stock value' -> stock_quantity -> products)"""
+        aggregate = self.intent_engine.analyze(text)['slots']['aggregate']
+        if not aggregate:
+            return None
+        tables = self.column_tables.get(self.column_index.match_word(aggregate[1]), ())
+        return tables[0] if len(tables) == 1 else None
+    
+    def _table_from_values(self, value_matches):
+        """The table all the values named in the question belong to, if one"""
+        tables = {table for table, _, _ in value_matches}
+        return tables.pop() if len(tables) == 1 else None
+    
     def _extract_filter_conditions(self, text, entities):
         """Extract WHERE clause conditions"""
-        text_lower = text.lower()
+        slots = self.intent_engine.analyze(text)['slots']
         
         # Look for common filter patterns
         # Pattern: "price under 500" or "price less than 500"
-        numeric_filter = re.search(r'(\w+)\s+(under|over|less than|greater than|above|below|>|<|>=|<=)\s+(\d+)', text_lower)
+        numeric_filter = slots['numeric_filter']
         if numeric_filter:
-            col_keyword = numeric_filter.group(1)
-            operator = numeric_filter.group(2)
-            value = numeric_filter.group(3)
+            col_keyword, operator, value = numeric_filter
             
             if entities['table']:
-                filter_col = self.fuzzy_match_column(entities['table'], col_keyword)
+                filter_col = self.fuzzy_match_column(entities['table'], col_keyword,
+                                                     prefer_indexed=True)
                 if filter_col:
                     entities['filter_column'] = filter_col
                     entities['filter_value'] = value
@@ -141,13 +366,13 @@ class PatternMatcher:
                     return entities
         
         # Pattern: "category = furniture" or "category is electronics"
-        text_filter = re.search(r'(\w+)\s*(?:=|is|equals?|are)\s+["\']?(\w+)["\']?', text_lower)
+        text_filter = slots['text_filter']
         if text_filter:
-            col_keyword = text_filter.group(1)
-            value = text_filter.group(2)
+            col_keyword, value = text_filter
             
             if entities['table']:
-                filter_col = self.fuzzy_match_column(entities['table'], col_keyword)
+                filter_col = self.fuzzy_match_column(entities['table'], col_keyword,
+                                                     prefer_indexed=True)
                 if filter_col:
                     entities['filter_column'] = filter_col
                     entities['filter_value'] = value
@@ -156,6 +381,79 @@ class PatternMatcher:
         
         return entities
     
+    def _extract_aggregation(self, text, entities):
+        """Extract the aggregate function and column, the GROUP BY column and
+        the top-N ordering"""
+        table = entities['table']
+        if not table:
+            return entities
+        slots = self.intent_engine.analyze(text)['slots']
+        
+        # Pattern: "by department" / "per category"
+        if slots['group_by']:
+            entities['group_by'] = self.fuzzy_match_column(table, slots['group_by'][0])
+        
+        numeric_columns = [
+            col for col in entities['columns']
+            if col != entities['group_by'] and self.is_numeric(table, col)
+        ]
+        
+        # Pattern: "average salary" / "total of price"
+        if slots['aggregate']:
+            word, col_keyword = slots['aggregate']
+            entities['aggregate'] = self._normalize_aggregate(word)
+            column = self.fuzzy_match_column(table, col_keyword)
+            if column is None and table in self.column_indexes:
+                column = self.column_indexes[table].match_word(col_keyword)
+            if column is None or column == entities['group_by']:
+                column = numeric_columns[0] if numeric_columns else None
+            if column and (self.is_numeric(table, column)
+                           or entities['aggregate'] in ('MIN', 'MAX')):
+                entities['aggregate_column'] = column
+        
+        # Pattern: "top 5 products by price" / "3 cheapest products"
+        if slots['top_n']:
+            word, limit = slots['top_n']
+        elif slots['n_superlative']:
+            limit, word = slots['n_superlative']
+        else:
+            return entities
+        entities['limit'] = int(limit)
+        entities['order_direction'] = 'ASC' if word in ASCENDING_WORDS else 'DESC'
+        order_by = entities['group_by']
+        if order_by is None and numeric_columns:
+            order_by = numeric_columns[0]
+        if order_by is None and word in ('cheapest', 'most expensive'):
+            order_by = self.fuzzy_match_column(table, 'price')
+        entities['order_by'] = order_by
+        entities['group_by'] = None
+        
+        return entities
+    
+    def _extract_value_filter(self, value_matches, entities):
+        """Filter on the column holding a value the question names, when no
+        explicit condition was found"""
+        if entities['filter_column'] or not entities['table']:
+            return entities
+        for table, column, value in value_matches:
+            if table == entities['table'] and column != entities['group_by']:
+                entities['filter_column'] = column
+                entities['filter_value'] = value
+                entities['filter_operator'] = '='
+                break
+        return entities
+    
+    def _normalize_aggregate(self, word):
+        """Map an aggregate word to its SQL function"""
+        if word in ['average', 'avg', 'mean']:
+            return 'AVG'
+        elif word in ['minimum', 'min', 'lowest', 'smallest']:
+            return 'MIN'
+        elif word in ['maximum', 'max', 'highest', 'largest']:
+            return 'MAX'
+        else:
+            return 'SUM'
+    
     def _normalize_operator(self, op):
         """Normalize operator strings to SQL operators"""
         op = op.lower()
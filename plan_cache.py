@@ -0,0 +1,84 @@
+import copy
+import threading
+from collections import OrderedDict
+
+
+class FrozenDict(dict):
+    """A dict that refuses changes, so a cached plan can be shared by every
+    request that hits it without copying. Still a dict to JSON encoders;
+    ``copy.deepcopy`` gives back a plain, mutable dict."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("cached plans are read-only")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __deepcopy__(self, memo):
+        return {key: copy.deepcopy(value, memo) for key, value in self.items()}
+
+
+def freeze(value):
+    """``value`` with every dict made a FrozenDict and every list a tuple"""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class PlanCache:
+    """LRU map from a normalized message to its resolved query plan.
+
+    Every entry records the schema version it was resolved against; entries
+    from an older schema are treated as misses and dropped. Plans are stored
+    frozen (see ``freeze``): a hit returns the shared, read-only plan, and
+    callers copy just the top-level fields they change.
+    """
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, schema_version):
+        """Return the cached plan for ``key`` or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                version, plan = entry
+                if version == schema_version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return plan
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, schema_version, plan):
+        """Remember a frozen copy of ``plan`` for ``key``, evicting the least
+        recently used"""
+        if self.max_entries <= 0:
+            return
+        plan = freeze(plan)
+        with self._lock:
+            self._entries[key] = (schema_version, plan)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached plan"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -1,46 +1,81 @@
 import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
+
+_NON_ALNUM = re.compile(r'[^a-z0-9\s]')
+
+_FALLBACK_STOPWORDS = frozenset({'the', 'a', 'an', 'in', 'on', 'at',
+                                 'is', 'are', 'was', 'were'})
+
+# On text that clean_text has reduced to [a-z0-9\s], NLTK's word_tokenize
+# only differs from str.split by splitting these contractions
+_SPLIT_CONTRACTIONS = {
+    'cannot': ('can', 'not'),
+    'gimme': ('gim', 'me'),
+    'gonna': ('gon', 'na'),
+    'gotta': ('got', 'ta'),
+    'lemme': ('lem', 'me'),
+    'wanna': ('wan', 'na'),
+}
+
 
 class TextPreprocessor:
-    def __init__(self):
-        try:
-            self.stop_words = set(stopwords.words('english'))
-        except:
-            self.stop_words = {'the', 'a', 'an', 'in', 'on', 'at', 
-                               'is', 'are', 'was', 'were'}
-    
+    # Built on first use and shared by every instance
+    _stop_words = None
+
+    @property
+    def stop_words(self):
+        """English stopwords from NLTK (loaded lazily), or a small fallback"""
+        if TextPreprocessor._stop_words is None:
+            try:
+                from nltk.corpus import stopwords
+                TextPreprocessor._stop_words = frozenset(stopwords.words('english'))
+            except Exception:
+                TextPreprocessor._stop_words = _FALLBACK_STOPWORDS
+        return TextPreprocessor._stop_words
+
     def clean_text(self, text):
         """Clean and normalize input text"""
         text = text.lower()
-        text = re.sub(r'[^a-z0-9\s]', '', text)
+        text = _NON_ALNUM.sub('', text)
         text = ' '.join(text.split())
         return text
-    
-    def tokenize(self, text):
-        """Tokenize text into words"""
+
+    def tokenize(self, text, cleaned=False):
+        """Tokenize text into words.
+
+        Text that has already been through clean_text is split in a single
+        pass without NLTK; raw text still goes through word_tokenize.
+        """
+        if cleaned:
+            tokens = []
+            for word in text.split():
+                tokens.extend(_SPLIT_CONTRACTIONS.get(word, (word,)))
+            return tokens
         try:
+            from nltk.tokenize import word_tokenize
             tokens = word_tokenize(text)
-        except:
+        except Exception:
             tokens = text.split()
         return tokens
-    
+
     def remove_stopwords(self, tokens):
         """Remove common stopwords"""
-        return [word for word in tokens if word not in self.stop_words]
-    
-    def extract_keywords(self, text):
-        """Extract important keywords from text"""
-        cleaned = self.clean_text(text)
-        tokens = self.tokenize(cleaned)
+        stop_words = self.stop_words
+        return [word for word in tokens if word not in stop_words]
+
+    def extract_keywords(self, text, cleaned=None):
+        """Extract important keywords from text (pass ``cleaned`` if the
+        clean_text form is already known)"""
+        if cleaned is None:
+            cleaned = self.clean_text(text)
+        tokens = self.tokenize(cleaned, cleaned=True)
         keywords = self.remove_stopwords(tokens)
         return keywords
-    
+
     def preprocess(self, text):
         """Full preprocessing pipeline"""
+        cleaned = self.clean_text(text)
         return {
             'original': text,
-            'cleaned': self.clean_text(text),
-            'keywords': self.extract_keywords(text)
+            'cleaned': cleaned,
+            'keywords': self.extract_keywords(text, cleaned)
         }
@@ -1,14 +1,25 @@
 import re
 
+from config import Config
+
+_INTEGER = re.compile(r'^-?\d+$')
+_DECIMAL = re.compile(r'^-?\d+\.\d+$')
+
+
 class QueryGenerator:
     def __init__(self, pattern_matcher):
         self.pattern_matcher = pattern_matcher
-        
+    
     def generate_sql(self, intent, entities, original_text):
-        """Generate SQL query based on intent and entities"""
+        """Generate SQL query based on intent and entities.
+        
+        Returns ``(template, params, error)``. Values are never inlined:
+        the template holds ``%s`` placeholders and ``params`` their values,
+        so one template (and its prepared statement) serves every value.
+        """
         
         if not entities.get('table'):
-            return None, "Could not identify which table to query"
+            return None, [], "Could not identify which table to query"
         
         table = entities['table']
         
@@ -27,45 +38,119 @@ class QueryGenerator:
         elif intent == 'filter_text':
             return self._generate_filter_text(table, entities, original_text)
         
+        elif intent == 'aggregate':
+            return self._generate_aggregate(table, entities)
+        
+        elif intent == 'top_n':
+            return self._generate_top_n(table, entities)
+        
         else:
             return self._generate_select_all(table, entities)
     
+    def _slots(self, text):
+        """Slot captures from the intent engine's (cached) scan of ``text``"""
+        return self.pattern_matcher.intent_engine.analyze(text)['slots']
+    
+    @staticmethod
+    def quote_identifier(name):
+        """Backtick-quote a table or column name"""
+        return '`' + str(name).replace('`', '``') + '`'
+    
+    @staticmethod
+    def _typed_value(value):
+        """Bind numbers as numbers and everything else as text"""
+        text = str(value)
+        if _INTEGER.match(text):
+            return int(text)
+        if _DECIMAL.match(text):
+            return float(text)
+        return value
+    
+    def _condition(self, column, operator, value):
+        """One ``column <op> %s`` condition and its parameter"""
+        return f"{self.quote_identifier(column)} {operator} %s", self._typed_value(value)
+    
+    def _where_from_entities(self, entities, default_operator='='):
+        """WHERE clause for the extracted filter condition and any further
+        ``filters`` added by follow-up refinements, ANDed together"""
+        conditions = []
+        params = []
+        if entities.get('filter_column') and entities.get('filter_value'):
+            condition, param = self._condition(
+                entities['filter_column'],
+                entities.get('filter_operator', default_operator),
+                entities['filter_value']
+            )
+            conditions.append(condition)
+            params.append(param)
+        for column, operator, value in entities.get('filters') or ():
+            condition, param = self._condition(column, operator, value)
+            conditions.append(condition)
+            params.append(param)
+        if not conditions:
+            return '', []
+        return f" WHERE {' AND '.join(conditions)}", params
+    
     def _generate_select_all(self, table, entities):
         """Generate SELECT * query, with WHERE clause if filter exists"""
-        query = f"SELECT * FROM {table}"
+        query = f"SELECT * FROM {self.quote_identifier(table)}"
         
         # Add WHERE clause if filter condition exists
-        if entities.get('filter_column') and entities.get('filter_value'):
-            column = entities['filter_column']
-            value = entities['filter_value']
-            operator = entities.get('filter_operator', '=')
-            
-            # Quote string values, don't quote numbers
-            try:
-                float(value)
-                query += f" WHERE {column} {operator} {value}"
-            except:
-                query += f" WHERE {column} {operator} '{value}'"
-        
-        return query, None
+        where, params = self._where_from_entities(entities)
+        return query + where, params, None
     
     def _generate_count(self, table, entities):
-        """Generate COUNT query"""
-        query = f"SELECT COUNT(*) as count FROM {table}"
+        """Generate COUNT query, one count per group for 'by <column>'"""
+        group = entities.get('group_by')
+        if group:
+            group = self.quote_identifier(group)
+            query = f"SELECT {group}, COUNT(*) as count FROM {self.quote_identifier(table)}"
+        else:
+            query = f"SELECT COUNT(*) as count FROM {self.quote_identifier(table)}"
         
         # Add WHERE clause if filter condition exists
-        if entities.get('filter_column') and entities.get('filter_value'):
-            column = entities['filter_column']
-            value = entities['filter_value']
-            operator = entities.get('filter_operator', '=')
-            
-            try:
-                float(value)
-                query += f" WHERE {column} {operator} {value}"
-            except:
-                query += f" WHERE {column} {operator} '{value}'"
-        
-        return query, None
+        where, params = self._where_from_entities(entities)
+        query += where
+        if group:
+            query += f" GROUP BY {group} ORDER BY count DESC"
+        return query, params, None
+    
+    def _generate_aggregate(self, table, entities):
+        """Generate SUM/AVG/MIN/MAX query, grouped for 'by <column>'"""
+        function = entities.get('aggregate')
+        column = entities.get('aggregate_column')
+        if not function or not column:
+            return None, [], "Could not determine which field to aggregate"
+        
+        alias = self.quote_identifier(f"{function.lower()}_{column}")
+        select = f"{function}({self.quote_identifier(column)}) AS {alias}"
+        group = entities.get('group_by')
+        if group:
+            group = self.quote_identifier(group)
+            select = f"{group}, {select}"
+        query = f"SELECT {select} FROM {self.quote_identifier(table)}"
+        
+        where, params = self._where_from_entities(entities)
+        query += where
+        if group:
+            query += f" GROUP BY {group} ORDER BY {group}"
+        return query, params, None
+    
+    def _generate_top_n(self, table, entities):
+        """Generate ORDER BY ... LIMIT query for 'top 5 products by price'"""
+        column = entities.get('order_by')
+        if not column:
+            return None, [], "Could not determine which field to rank by"
+        
+        query = f"SELECT * FROM {self.quote_identifier(table)}"
+        where, params = self._where_from_entities(entities)
+        direction = 'ASC' if entities.get('order_direction') == 'ASC' else 'DESC'
+        query += f"{where} ORDER BY {self.quote_identifier(column)} {direction} LIMIT %s"
+        limit = int(entities['limit'])
+        cap = self.row_cap(table)
+        if cap is not None:
+            limit = min(limit, cap)
+        return query, params + [limit], None
     
     def _generate_specific_field(self, table, entities, original_text):
         """Generate query for specific field (e.g., 'salary of John Doe')"""
@@ -80,66 +165,110 @@ class QueryGenerator:
             elif 'email' in text_lower:
                 entities['columns'] = ['email']
             else:
-                return None, "Could not identify which field to retrieve"
+                return None, [], "Could not identify which field to retrieve"
         
-        columns = ', '.join(entities['columns'])
-        query = f"SELECT {columns} FROM {table}"
+        columns = ', '.join(self.quote_identifier(c) for c in entities['columns'])
+        query = f"SELECT {columns} FROM {self.quote_identifier(table)}"
+        params = []
         
         # Look for "of" or "for" pattern to extract WHERE condition
-        name_match = re.search(r'(?:of|for)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)', original_text)
-        if name_match:
-            name = name_match.group(1)
-            query += f" WHERE name = '{name}'"
+        name = self._slots(original_text)['name_ref']
+        if name:
+            condition, param = self._condition('name', '=', name)
+            query += f" WHERE {condition}"
+            params.append(param)
         
-        return query, None
+        return query, params, None
     
     def _generate_filter_numeric(self, table, entities, original_text):
         """Generate query with numeric filters"""
         
         text_lower = original_text.lower()
-        query = f"SELECT * FROM {table}"
+        query = f"SELECT * FROM {self.quote_identifier(table)}"
         
         # Use extracted filter condition if available
         if entities.get('filter_column') and entities.get('filter_value'):
-            column = entities['filter_column']
-            value = entities['filter_value']
-            operator = entities.get('filter_operator', '<')
-            query += f" WHERE {column} {operator} {value}"
+            where, params = self._where_from_entities(entities, default_operator='<')
+            return query + where, params, None
+        
+        # Fallback: try to infer
+        if 'price' in text_lower:
+            column = 'price'
+        elif 'salary' in text_lower:
+            column = 'salary'
+        elif 'quantity' in text_lower:
+            column = 'stock_quantity'
         else:
-            # Fallback: try to infer
-            if 'price' in text_lower:
-                column = 'price'
-            elif 'salary' in text_lower:
-                column = 'salary'
-            elif 'quantity' in text_lower:
-                column = 'stock_quantity'
-            else:
-                return None, "Could not determine which field to filter"
-            
-            if not entities.get('values'):
-                return None, "Could not extract numeric value"
-            
-            value = entities['values'][0]
-            
-            if re.search(r'(greater than|more than|above|>)', text_lower):
-                operator = '>'
-            elif re.search(r'(less than|below|under|<)', text_lower):
-                operator = '<'
-            else:
-                operator = '='
-            
-            query += f" WHERE {column} {operator} {value}"
+            return None, [], "Could not determine which field to filter"
+        
+        if not entities.get('values'):
+            return None, [], "Could not extract numeric value"
         
-        return query, None
+        value = entities['values'][0]
+        
+        slots = self._slots(original_text)
+        if slots['greater']:
+            operator = '>'
+        elif slots['less']:
+            operator = '<'
+        else:
+            operator = '='
+        
+        condition, param = self._condition(column, operator, value)
+        return f"{query} WHERE {condition}", [param], None
     
     def _generate_filter_text(self, table, entities, original_text):
         """Generate query with text filters"""
         
-        query = f"SELECT * FROM {table}"
+        query = f"SELECT * FROM {self.quote_identifier(table)}"
+        params = []
         
         if entities.get('filter_column') and entities.get('filter_value'):
-            column = entities['filter_column']
-            value = entities['filter_value']
-            query += f" WHERE {column} = '{value}'"
+            condition, param = self._condition(entities['filter_column'], '=',
+                                               entities['filter_value'])
+            query += f" WHERE {condition}"
+            params.append(param)
+        
+        return query, params, None
+    
+    @staticmethod
+    def row_cap(table):
+        """Most rows one answer may return from ``table``, or None if uncapped"""
+        cap = int(Config.TABLE_ROW_CAPS.get(table, Config.MAX_ROWS))
+        return cap if cap > 0 else None
+    
+    def cap_rows(self, sql, params, table):
+        """Bound a row-returning query by its table's row cap.
+        
+        Returns ``(query, params, cap)``. The query fetches one row more than
+        ``cap`` so the caller can tell whether the result was truncated;
+        ``cap`` is None (and the query unchanged) when the table is uncapped.
+        """
+        cap = self.row_cap(table)
+        if cap is None:
+            return sql, params, None
+        return f"{sql} LIMIT %s", list(params or []) + [cap + 1], cap
+    
+    def paginate(self, sql, params, table, columns, after, page_size):
+        """Wrap a row-returning query for keyset pagination.
+        
+        Returns ``(query, params, key_column)``, fetching one row more than
+        ``page_size`` so the caller can tell whether another page exists, or
+        None when the query cannot be paged (no single-column primary key in
+        its output).
+        """
+        key_column = self.pattern_matcher.primary_key(table)
+        if key_column is None:
+            return None
+        if columns and key_column not in columns:
+            return None
         
-        return query, None
+        key = f"page.{self.quote_identifier(key_column)}"
+        query = f"SELECT * FROM ({sql}) AS page"
+        params = list(params or [])
+        if after is not None:
+            query += f" WHERE {key} > %s"
+            params.append(after)
+        query += f" ORDER BY {key} LIMIT %s"
+        params.append(int(page_size) + 1)
+        return query, params, key_column
@@ -0,0 +1,102 @@
+import datetime
+import gzip
+from decimal import Decimal
+
+from werkzeug.datastructures import Accept, MIMEAccept
+from werkzeug.http import parse_accept_header
+
+# Optional encoders: without them the formats are simply not offered
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_TYPE = 'application/json'
+MSGPACK_TYPE = 'application/msgpack'
+
+# Shapes of the ``data`` of a row answer
+DATA_FORMATS = ('rows', 'columnar')
+
+# Fast settings: for a chat answer the encoding time matters more than the
+# last few percent of size
+_GZIP_LEVEL = 5
+_BROTLI_QUALITY = 4
+
+
+def to_columnar(rows):
+    """``[{'a': 1, 'b': 2}, ...]`` as ``{'columns': ['a', 'b'], 'rows': [[1, 2], ...]}``,
+    naming each column once instead of on every row"""
+    columns = list(rows[0]) if rows else []
+    return {'columns': columns, 'rows': [[row.get(c) for c in columns] for row in rows]}
+
+
+def shape_options(data, default_format='rows'):
+    """``(data_format, debug)`` asked for by a request body"""
+    data_format = data.get('format') or default_format
+    if data_format not in DATA_FORMATS:
+        data_format = 'rows'
+    return data_format, bool(data.get('debug') or data.get('timings'))
+
+
+def shape(response, data_format='rows', debug=False):
+    """The response as sent: ``data`` in ``data_format`` and the ``debug``
+    block only when asked for"""
+    shaped = dict(response)
+    if not debug:
+        shaped.pop('debug', None)
+    if data_format == 'columnar' and isinstance(shaped.get('data'), list):
+        shaped['data'] = to_columnar(shaped['data'])
+    return shaped
+
+
+def media_types():
+    """Response media types available, preferred first"""
+    return [JSON_TYPE, MSGPACK_TYPE] if msgpack is not None else [JSON_TYPE]
+
+
+def content_encodings():
+    """Compressions available, preferred first"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def negotiate(accept=None, accept_encoding=None):
+    """``(media_type, encoding)`` to answer with, given the request's Accept
+    and Accept-Encoding headers; ``encoding`` is None for none"""
+    media_type = parse_accept_header(accept, MIMEAccept).best_match(
+        media_types(), default=JSON_TYPE)
+    encoding = parse_accept_header(accept_encoding, Accept).best_match(content_encodings())
+    return media_type, encoding
+
+
+def _msgpack_default(value):
+    # The column types msgpack has no encoding for
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, datetime.timedelta)):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+
+def encode(payload, media_type, dumps_json):
+    """Serialize ``payload`` as ``media_type``; ``dumps_json`` is the JSON
+    encoder to use (the app's, so values render as with jsonify)"""
+    if media_type == MSGPACK_TYPE and msgpack is not None:
+        return msgpack.packb(payload, default=_msgpack_default, use_bin_type=True)
+    return dumps_json(payload).encode('utf-8')
+
+
+def compress(body, encoding, min_bytes=1024):
+    """``(body, applied_encoding)``: the body compressed with ``encoding``
+    ('br' or 'gzip'), or unchanged with None when it is too small to gain"""
+    if encoding is None or len(body) < min_bytes:
+        return body, None
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(body, quality=_BROTLI_QUALITY), 'br'
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=_GZIP_LEVEL), 'gzip'
+    return body, None
@@ -0,0 +1,129 @@
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Whitespace runs outside of quoted string literals
+_WHITESPACE = re.compile(r"""('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")|\s+""")
+_TABLE_REF = re.compile(r'\b(?:FROM|JOIN)\s+`?(\w+)`?', re.IGNORECASE)
+
+
+def normalize_sql(query):
+    """Collapse whitespace and drop a trailing semicolon"""
+    collapsed = _WHITESPACE.sub(lambda m: m.group(1) or ' ', query)
+    return collapsed.strip().rstrip(';').rstrip()
+
+
+def tables_in(query):
+    """Names of the tables a statement reads from"""
+    return {name.lower() for name in _TABLE_REF.findall(query)}
+
+
+def estimate_size(rows, sample=20):
+    """Rough in-memory size of a result set in bytes, from a sample of rows"""
+    if not rows:
+        return sys.getsizeof(rows)
+    sampled = rows[:sample]
+    per_row = sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in row.items())
+        for row in sampled
+    ) / len(sampled)
+    return int(sys.getsizeof(rows) + per_row * len(rows))
+
+
+class ResultCache:
+    """Memory-bounded LRU cache of query results with per-table TTLs.
+
+    Entries are keyed on the normalized SQL text and its parameters. An
+    entry's lifetime is the shortest TTL of the tables it reads; a TTL of 0
+    disables caching for that table. Cached rows are shared between callers
+    and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entries=1024,
+                 default_ttl=30, table_ttls=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.table_ttls = {k.lower(): v for k, v in (table_ttls or {}).items()}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(query, params):
+        return normalize_sql(query), tuple(params or ())
+
+    def _ttl(self, tables):
+        if not tables:
+            return self.default_ttl
+        return min(self.table_ttls.get(t, self.default_ttl) for t in tables)
+
+    def get(self, query, params=None):
+        """Return ``(True, rows)`` on a fresh hit, else ``(False, None)``"""
+        key = self._key(query, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                rows, expires_at, size, _ = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, rows
+                self._remove(key)
+            self.misses += 1
+            return False, None
+
+    def put(self, query, params, rows):
+        """Cache ``rows`` for a statement; returns whether it was stored"""
+        key = self._key(query, params)
+        tables = tables_in(key[0])
+        ttl = self._ttl(tables)
+        size = estimate_size(rows)
+        if ttl <= 0 or size > self.max_bytes:
+            return False
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (rows, time.monotonic() + ttl, size, tables)
+            self._bytes += size
+            while self._entries and (self._bytes > self.max_bytes
+                                     or len(self._entries) > self.max_entries):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def _remove(self, key):
+        _, _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate_table(self, table):
+        """Drop every cached result that reads ``table``; returns the count"""
+        table = table.lower()
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if table in entry[3]]
+            for key in stale:
+                self._remove(key)
+        return len(stale)
+
+    def clear(self):
+        """Drop every cached result"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Hit/miss counters and current occupancy"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
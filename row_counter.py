@@ -0,0 +1,143 @@
+import threading
+import time
+
+from query_generator import QueryGenerator
+
+# Accuracy levels a caller can ask for, from most to least precise
+ACCURACY_LEVELS = ('exact', 'cached', 'estimate')
+
+
+class RowCounter:
+    """Row counts of whole tables at a selectable accuracy.
+
+    - ``exact`` runs ``SELECT COUNT(*)`` now.
+    - ``cached`` serves an exact count taken at most ``ttl`` seconds ago,
+      counting again when it has expired.
+    - ``estimate`` reads InnoDB's row estimate from information_schema,
+      which needs no scan at all.
+
+    Tables asked for at least ``hot_threshold`` times are recounted by a
+    background thread every ``refresh_interval`` seconds, so their cached
+    counts stay fresh without a request waiting on the scan. Request counts
+    halve after every refresh, so tables that cool down drop out.
+    """
+
+    def __init__(self, db, ttl=60, hot_threshold=5, refresh_interval=30):
+        self.db = db
+        self.ttl = ttl
+        self.hot_threshold = hot_threshold
+        self.refresh_interval = refresh_interval
+        self._exact = {}
+        self._estimates = {}
+        self._requests = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher = None
+
+    def count(self, table, accuracy='cached', deadline=None):
+        """Count the rows of ``table``.
+
+        Returns ``(count, info)`` where ``info`` holds ``accuracy``
+        ('exact' or 'estimated') and ``age``, the seconds since the figure
+        was taken; None if the table could not be counted. A scan needed
+        to answer is bound by ``deadline``.
+        """
+        if accuracy == 'estimate':
+            estimate = self.estimate(table)
+            if estimate is not None:
+                return estimate
+            accuracy = 'cached'
+        if accuracy == 'cached':
+            self._record_request(table)
+            with self._lock:
+                entry = self._exact.get(table)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                return entry[0], {'accuracy': 'exact',
+                                  'age': round(time.monotonic() - entry[1], 3)}
+        count = self._count_exact(table, deadline)
+        if count is None:
+            return None
+        return count, {'accuracy': 'exact', 'age': 0.0}
+
+    def _count_exact(self, table, deadline=None):
+        results = self.db.execute_query(
+            f"SELECT COUNT(*) AS count FROM {QueryGenerator.quote_identifier(table)}",
+            deadline=deadline)
+        if not results:
+            return None
+        count = int(results[0]['count'])
+        with self._lock:
+            self._exact[table] = (count, time.monotonic())
+        return count
+
+    def estimate(self, table):
+        """InnoDB's row estimate, cached for ``ttl`` seconds: ``(count, info)``
+        or None when the server has none"""
+        with self._lock:
+            entry = self._estimates.get(table)
+        now = time.monotonic()
+        if entry is None or now - entry[1] >= self.ttl:
+            estimate = self.db.estimate_row_count(table)
+            if estimate is None:
+                return None
+            entry = (estimate, now)
+            with self._lock:
+                self._estimates[table] = entry
+        return entry[0], {'accuracy': 'estimated', 'age': round(now - entry[1], 3)}
+
+    def _record_request(self, table):
+        with self._lock:
+            self._requests[table] = self._requests.get(table, 0) + 1
+            hot = self._requests[table] >= self.hot_threshold
+        if hot and self._refresher is None and self.refresh_interval > 0:
+            self._start_refresher()
+
+    def _start_refresher(self):
+        with self._lock:
+            if self._refresher is not None:
+                return
+            # Each refresher gets its own stop event, so one started after
+            # close() is not stopped from the outset
+            self._stop = threading.Event()
+            self._refresher = refresher = threading.Thread(
+                target=self._refresh_loop, args=(self._stop,),
+                name='row-counter-refresh', daemon=True
+            )
+        refresher.start()
+
+    def hot_tables(self):
+        """Tables currently kept fresh by the background refresher"""
+        with self._lock:
+            return [table for table, requests in self._requests.items()
+                    if requests >= self.hot_threshold]
+
+    def _refresh_loop(self, stop):
+        while not stop.wait(self.refresh_interval):
+            for table in self.hot_tables():
+                try:
+                    self._count_exact(table)
+                except Exception as e:
+                    print(f"⚠️ Failed to refresh row count of {table}: {e}")
+            with self._lock:
+                self._requests = {table: requests // 2
+                                  for table, requests in self._requests.items()
+                                  if requests // 2}
+
+    def invalidate(self, table):
+        """Forget the counts of ``table`` (e.g. after a write)"""
+        with self._lock:
+            self._exact.pop(table, None)
+            self._estimates.pop(table, None)
+
+    def stats(self):
+        """Cached counts and hot tables"""
+        with self._lock:
+            cached = len(self._exact)
+        return {'cached': cached, 'hot': len(self.hot_tables())}
+
+    def close(self):
+        """Stop the background refresher; it starts again once a table is
+        hot (e.g. after the chatbot is initialized again)"""
+        with self._lock:
+            self._stop.set()
+            self._refresher = None
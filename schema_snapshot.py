@@ -0,0 +1,53 @@
+import json
+import os
+import time
+
+# Bump whenever the layout of the saved schema changes
+SNAPSHOT_VERSION = 3
+
+
+def load_snapshot(path, identity, max_age):
+    """Return ``(schema, values)`` saved at ``path`` if still valid, else
+    ``(None, None)``; ``values`` is None when none were saved.
+
+    A snapshot is valid when it was written by this snapshot version, for the
+    same database, and less than ``max_age`` seconds ago.
+    """
+    if not path or max_age <= 0:
+        return None, None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None, None
+
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        return None, None
+    if snapshot.get('identity') != identity:
+        return None, None
+    if time.time() - snapshot.get('saved_at', 0) > max_age:
+        return None, None
+    return snapshot.get('schema'), snapshot.get('values')
+
+
+def save_snapshot(path, identity, schema, values=None):
+    """Atomically write ``schema`` and the value index's ``values`` to
+    ``path``; returns True on success"""
+    if not path:
+        return False
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'identity': identity,
+        'saved_at': time.time(),
+        'schema': schema,
+        'values': values
+    }
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+        return True
+    except (OSError, TypeError, ValueError) as e:
+        print(f"⚠️ Could not save schema snapshot: {e}")
+        return False
@@ -0,0 +1,79 @@
+import threading
+
+
+class SchemaWatcher:
+    """Keeps a PatternMatcher in step with the live schema without a restart.
+
+    Every ``interval`` seconds it reads one fingerprint per table (a single
+    cheap information_schema query) and compares it with the previous poll.
+    Only tables whose fingerprint changed are loaded again and swapped into
+    the matcher; ``on_change`` is then called with the changed table names,
+    so caches that read them can be invalidated.
+
+    The first poll compares the full live schema with what the matcher
+    loaded, which may have come from a snapshot written before a migration.
+    """
+
+    def __init__(self, db, matcher, interval=60, on_change=None):
+        self.db = db
+        self.matcher = matcher
+        self.interval = interval
+        self.on_change = on_change
+        self.changes = 0
+        self._fingerprints = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Poll in a background thread; a no-op when the interval is 0"""
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._thread = threading.Thread(
+            target=self._watch_loop, name='schema-watcher', daemon=True
+        )
+        self._thread.start()
+
+    def _watch_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️ Schema check failed: {e}")
+
+    def check(self):
+        """Poll once and apply what changed; returns the changed tables"""
+        fingerprints = self.db.schema_fingerprints()
+        if fingerprints is None:
+            return []
+
+        if self._fingerprints is None:
+            live = self.db.get_schema()
+            if live is None:
+                return []
+            loaded = self.matcher.schema
+            changed = {table: columns for table, columns in live.items()
+                       if loaded.get(table) != columns}
+        else:
+            stale = [table for table, fingerprint in fingerprints.items()
+                     if self._fingerprints.get(table) != fingerprint]
+            live = self.db.get_schema(stale) if stale else {}
+            if live is None:
+                return []
+            changed = dict(live)
+        changed.update({table: None for table in self.matcher.schema
+                        if table not in fingerprints})
+        self._fingerprints = fingerprints
+
+        if not changed:
+            return []
+        self.matcher.apply_schema_changes(changed)
+        self.changes += 1
+        tables = sorted(changed)
+        print(f"🔄 Schema changed: {', '.join(tables)}")
+        if self.on_change is not None:
+            self.on_change(tables)
+        return tables
+
+    def stop(self):
+        """Stop the background poller"""
+        self._stop.set()
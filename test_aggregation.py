@@ -0,0 +1,50 @@
+import pytest
+
+from fuzzy_index import FuzzyIndex
+
+
+def _rows(chatbot, table):
+    return chatbot.process_message(f"show all {table}")['data']
+
+
+@pytest.mark.parametrize('text, table, function, column', [
+    ("average salary by department", 'employees', 'AVG', 'salary'),
+    ("max price", 'products', 'MAX', 'price'),
+    ("total amount of orders", 'orders', 'SUM', 'total_amount'),
+    ("total stock value", 'products', 'SUM', 'stock_quantity'),
+    ("average stock of products", 'products', 'AVG', 'stock_quantity'),
+])
+def test_aggregate_resolves(chatbot, text, table, function, column):
+    plan = chatbot.plan_message(text)
+    assert plan['intent'] == 'aggregate'
+    assert plan['entities']['table'] == table
+    assert (plan['entities']['aggregate'], plan['entities']['aggregate_column']) == (function, column)
+
+
+def test_total_stock_value(chatbot):
+    total = sum(row['stock_quantity'] for row in _rows(chatbot, 'products'))
+    response = chatbot.process_message("total stock value")
+    assert response['success']
+    assert response['data'] == [{'sum_stock_quantity': total}]
+
+
+def test_grouped_average(chatbot):
+    rows = _rows(chatbot, 'employees')
+    response = chatbot.process_message("average salary by department")
+    assert response['success']
+    assert len(response['data']) == len({row['department'] for row in rows})
+
+
+def test_top_n(chatbot):
+    prices = sorted((row['price'] for row in _rows(chatbot, 'products')), reverse=True)
+    response = chatbot.process_message("top 5 products by price")
+    assert [row['price'] for row in response['data']] == prices[:5]
+
+
+def test_match_word_needs_one_name():
+    index = FuzzyIndex(['stock_quantity', 'quantity', 'total_amount'])
+    assert index.match('stock', 85) is None
+    assert index.match_word('stock') == 'stock_quantity'
+    assert index.match_word('Total') == 'total_amount'
+    assert index.match_word('quantity') is None
+    assert index.match_word('value') is None
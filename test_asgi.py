@@ -0,0 +1,162 @@
+import asyncio
+import gzip
+import importlib
+import json
+import threading
+
+import pytest
+
+from chatbot_core import Chatbot
+from config import Config
+from fake_database import FakeDatabaseManager
+
+
+class _ThreadRecordingDatabase(FakeDatabaseManager):
+    """Records the thread every database call runs on"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.threads = []
+
+    def _simulate_latency(self, deadline=None):
+        self.threads.append(threading.current_thread().name)
+        super()._simulate_latency(deadline)
+
+
+@pytest.fixture
+def asgi(monkeypatch):
+    # app.py starts warming its own (MySQL) chatbot when imported
+    monkeypatch.setattr(Config, 'WARMUP_ON_START', False)
+    return importlib.import_module('asgi')
+
+
+def _application(asgi, chatbot):
+    return asgi.ChatApplication(asgi.AsyncChatbot(chatbot), asgi.flask_app.app)
+
+
+@pytest.fixture
+def application(asgi, chatbot):
+    application = _application(asgi, chatbot)
+    yield application
+    application.bridge.close()
+
+
+async def _call(application, path, body=None, method='POST', headers=()):
+    """One request; returns ``(status, headers, body)``"""
+    request = [{'type': 'http.request', 'more_body': False,
+                'body': json.dumps(body).encode() if body is not None else b''}]
+    sent = []
+
+    async def receive():
+        return request.pop(0) if request else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+             'headers': [(k.encode(), v.encode()) for k, v in headers],
+             'http_version': '1.1', 'scheme': 'http', 'server': ('test', 80)}
+    await application(scope, receive, send)
+    start = sent[0]
+    return (start['status'], {k.decode(): v.decode() for k, v in start['headers']},
+            b''.join(message.get('body', b'') for message in sent[1:]))
+
+
+def _post(application, path, body, **kwargs):
+    return asyncio.run(_call(application, path, body, **kwargs))
+
+
+def test_lifespan_initializes_on_the_database_pool(asgi):
+    db = _ThreadRecordingDatabase()
+    chatbot = Chatbot(db=db)
+    application = _application(asgi, chatbot)
+    sent = []
+
+    async def lifespan():
+        events = asyncio.Queue()
+        await events.put({'type': 'lifespan.startup'})
+        await events.put({'type': 'lifespan.shutdown'})
+
+        async def send(message):
+            sent.append(message['type'])
+            if message['type'] == 'lifespan.startup.complete':
+                assert chatbot.is_ready
+
+        await application({'type': 'lifespan'}, events.get, send)
+
+    asyncio.run(lifespan())
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+    assert db.threads and all(name.startswith('chat-db') for name in db.threads)
+
+
+def test_chat_and_follow_up(application):
+    status, _, body = _post(application, '/api/chat',
+                            {'message': 'show all employees', 'session_id': 's'})
+    assert status == 200 and json.loads(body)['count'] == 200
+    status, _, body = _post(application, '/api/chat',
+                            {'message': 'only those in sales', 'session_id': 's',
+                             'debug': True, 'format': 'columnar'})
+    response = json.loads(body)
+    assert response['debug']['refined']
+    assert 'department' in response['data']['columns']
+
+
+def test_compressed_when_accepted(application):
+    _, headers, body = _post(application, '/api/chat', {'message': 'show all products'},
+                             headers=[('accept-encoding', 'gzip')])
+    assert headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(body))['count'] == 200
+
+
+def test_bad_requests(application):
+    assert _post(application, '/api/chat', None)[0] == 400
+    assert _post(application, '/api/chat', [1])[0] == 400
+    assert _post(application, '/api/chat', {})[0] == 400
+    assert _post(application, '/api/chat/batch', {'messages': []})[0] == 400
+
+
+def test_overload_is_refused(application):
+    application.bridge.max_pending = 0
+    status, _, body = _post(application, '/api/chat', {'message': 'show all products'})
+    assert status == 503 and not json.loads(body)['success']
+    assert application.bridge.pending == 0
+
+
+def test_stream(application):
+    status, headers, body = _post(application, '/api/chat/stream',
+                                  {'message': 'show all orders', 'batch_size': 7})
+    records = [json.loads(line) for line in body.decode().splitlines()]
+    assert status == 200 and headers['content-type'] == 'application/x-ndjson'
+    assert records[-1] == {'done': True, 'success': True, 'count': 200}
+    assert records[0]['success'] and len(records) == 202
+
+
+def test_batch_answers_each_message_once(application, chatbot):
+    status, _, body = _post(application, '/api/chat/batch',
+                            {'messages': ['how many employees', 'how many products',
+                                          'how many employees']})
+    results = json.loads(body)['results']
+    assert status == 200
+    assert [r['data'] for r in results] == [[{'count': 200}]] * 3
+    assert 'chatbot_requests_total{outcome="success"} 2' in chatbot.metrics.render()
+
+
+def test_database_calls_stay_off_the_cpu_pool(asgi, monkeypatch):
+    monkeypatch.setattr(Config, 'EXPLAIN_ROW_BUDGET', 50)
+    db = _ThreadRecordingDatabase()
+    chatbot = Chatbot(db=db)
+    application = _application(asgi, chatbot)
+    try:
+        for message in ('employees with salary over 5', 'show all employees',
+                        'only those in sales'):
+            _post(application, '/api/chat', {'message': message, 'session_id': 's'})
+        assert db.threads
+        assert not [name for name in db.threads if name.startswith('chat-cpu')]
+    finally:
+        application.bridge.close()
+
+
+def test_other_routes_go_to_flask(asgi, application, chatbot, monkeypatch):
+    monkeypatch.setattr(asgi.flask_app, 'chatbot', chatbot)
+    status, _, body = _post(application, '/api/health', None, method='GET')
+    assert status == 200 and json.loads(body)
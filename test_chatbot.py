@@ -19,7 +19,9 @@ def test_chatbot():
         "Show me all employees",
         "List products with price less than 500",
         "How many employees",
-        "What is the salary of John Doe"
+        "What is the salary of John Doe",
+        "Average salary by department",
+        "Top 5 products by price"
     ]
     
     passed = 0
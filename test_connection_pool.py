@@ -0,0 +1,145 @@
+import itertools
+import threading
+
+import pytest
+from mysql.connector import Error, OperationalError
+
+import database
+from database import ConnectionPool, DatabaseManager, PoolTimeoutError
+
+_ids = itertools.count(1)
+
+
+class _FakeCursor:
+    def __init__(self, raw):
+        self.raw = raw
+
+    def execute(self, query, params=()):
+        if self.raw.fail_next:
+            self.raw.fail_next = False
+            raise OperationalError("Lost connection to MySQL server during query")
+        self.raw.executed.append(query)
+
+    def fetchall(self):
+        return [{'connection': self.raw.connection_id}]
+
+    def close(self):
+        pass
+
+
+class _FakeConnection:
+    """Stands in for a mysql.connector connection"""
+
+    def __init__(self, **kwargs):
+        self.connection_id = next(_ids)
+        self.closed = False
+        self.fail_next = False
+        self.ping_error = False
+        self.drop_on_ping = False
+        self.executed = []
+
+    def cursor(self, **kwargs):
+        return _FakeCursor(self)
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        if self.ping_error:
+            raise Error("server has gone away")
+        if self.drop_on_ping:
+            self.connection_id = next(_ids)
+
+    def is_connected(self):
+        return not self.closed
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    connections = []
+
+    def connect(**kwargs):
+        connections.append(_FakeConnection(**kwargs))
+        return connections[-1]
+
+    monkeypatch.setattr(database.mysql.connector, 'connect', connect)
+    return connections
+
+
+def test_opens_lazily_and_reuses(opened):
+    pool = ConnectionPool({}, size=2)
+    assert not opened
+    first = pool.acquire()
+    pool.release(first)
+    assert pool.acquire() is first
+    second = pool.acquire()
+    assert len(opened) == 2
+    assert pool.stats() == {'size': 2, 'open': 2, 'idle': 0, 'in_use': 2}
+    pool.release(second)
+    assert pool.stats()['idle'] == 1
+
+
+def test_checkout_times_out_when_exhausted(opened):
+    pool = ConnectionPool({}, size=1, timeout=0.05)
+    held = pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    threading.Timer(0.05, pool.release, (held,)).start()
+    assert pool.acquire(timeout=2) is held
+
+
+def test_stale_connection_is_reconnected(opened):
+    pool = ConnectionPool({}, size=1, ping_interval=0)
+    conn = pool.acquire()
+    conn.prepared("SELECT %s")
+    conn.max_execution_time = 500
+    pool.release(conn)
+
+    opened[0].drop_on_ping = True
+    assert pool.acquire() is conn
+    assert not conn.statements and conn.max_execution_time is None
+
+
+def test_unreachable_connection_is_replaced(opened):
+    pool = ConnectionPool({}, size=1, ping_interval=0)
+    pool.release(pool.acquire())
+    opened[0].ping_error = True
+    conn = pool.acquire()
+    assert opened[0].closed
+    assert conn.raw is opened[1]
+
+
+def test_broken_connection_is_discarded(opened):
+    pool = ConnectionPool({}, size=1)
+    with pytest.raises(OperationalError):
+        with pool.connection():
+            raise OperationalError("gone")
+    assert opened[0].closed
+    assert pool.stats()['open'] == 0
+
+
+def test_query_is_retried_on_a_fresh_connection(opened):
+    db = DatabaseManager()
+    db.pool = ConnectionPool({}, size=1)
+    db.pool.release(db.pool.acquire())
+    opened[0].fail_next = True
+    assert db.execute_query("SELECT 1") == [{'connection': opened[1].connection_id}]
+    assert opened[0].closed
+
+
+def test_closed_pool_refuses_checkouts(opened):
+    pool = ConnectionPool({}, size=1)
+    pool.release(pool.acquire())
+    pool.close()
+    assert opened[0].closed
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+
+def test_execution_time_is_set_once_per_session(opened):
+    conn = ConnectionPool({}, size=1).acquire()
+    conn.set_max_execution_time(500)
+    conn.set_max_execution_time(500)
+    conn.set_max_execution_time(0)
+    assert opened[0].executed == ["SET SESSION MAX_EXECUTION_TIME = 500",
+                                  "SET SESSION MAX_EXECUTION_TIME = 0"]
@@ -0,0 +1,50 @@
+import pytest
+
+from chatbot_core import Chatbot
+from database import _execution_time_ms
+from deadline import Deadline
+from fake_database import FakeDatabaseManager
+
+
+@pytest.mark.parametrize('timeout', ['5', 'abc', [1], -1, None])
+def test_timeout_is_parsed(chatbot, timeout):
+    assert chatbot.process_message("show all employees", timeout=timeout)['success']
+    records = list(chatbot.stream_message("show all employees", timeout=timeout))
+    assert records[-1] == {'done': True, 'success': True, 'count': 200}
+
+
+def test_deadline_cancels_slow_queries():
+    bot = Chatbot(db=FakeDatabaseManager(latency=0.2))
+    assert bot.initialize()
+    try:
+        response = bot.process_message("show all products", timeout='0.1')
+        assert response['timed_out']
+    finally:
+        bot.close()
+
+
+def test_deadline_budget():
+    assert Deadline(None).remaining() is None
+    assert Deadline(0).bound(5) == 5
+    deadline = Deadline(2)
+    assert 0 < deadline.bound(10) <= 2
+    assert deadline.bound(1) == 1
+    assert not deadline.expired()
+    assert Deadline(1e-9).remaining() == 0.0
+
+
+def test_execution_time_is_rounded_to_a_step():
+    assert _execution_time_ms(None) == 0
+    assert _execution_time_ms(Deadline(None)) == 0
+    assert _execution_time_ms(Deadline(1.9)) in (1500, 1750)
+    assert 1 <= _execution_time_ms(Deadline(0.1)) <= 100
+
+
+def test_stream_times_out():
+    bot = Chatbot(db=FakeDatabaseManager(latency=0.2))
+    assert bot.initialize()
+    try:
+        records = list(bot.stream_message("show all products", timeout='0.1'))
+        assert records[-1]['timed_out']
+    finally:
+        bot.close()
@@ -0,0 +1,38 @@
+from fuzzy_index import FuzzyIndex
+
+
+def test_fuzzy_cache_is_bounded_lru():
+    index = FuzzyIndex(['employees', 'products', 'orders'], cache_size=2)
+    assert index.match('employes') == 'employees'
+    index.match('prodcts')
+    index.match('employes')
+    index.match('ordrs')
+    assert list(index._cache) == [('employes', 60, False), ('ordrs', 60, False)]
+    index.clear_cache()
+    assert not index._cache
+
+
+def test_exact_and_near_exact_hits():
+    index = FuzzyIndex(['employees', 'stock_quantity', 'order_items'])
+    assert index.match('EMPLOYEES') == 'employees'
+    assert index.match('employee') == 'employees'
+    assert index.match('stockquantity') == 'stock_quantity'
+    assert index.match('Order-Items') == 'order_items'
+
+
+def test_match_many_keeps_input_order():
+    index = FuzzyIndex(['employees', 'products', 'orders'])
+    assert index.match_many(['prodcts', 'xyz', 'employes'], 60) == [
+        'products', None, 'employees']
+
+
+def test_threshold_rejects_weak_matches():
+    index = FuzzyIndex(['employees'])
+    assert index.match('emp', 85) is None
+
+
+def test_preferred_name_wins_a_near_tie():
+    index = FuzzyIndex(['customer', 'custom'], preferred=['custom'], tie_margin=5)
+    assert index.match('customr') == 'customer'
+    assert index.match('customr', prefer=True) == 'custom'
+    assert index.match('custmer', prefer=True) == 'customer'
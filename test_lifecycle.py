@@ -0,0 +1,73 @@
+import threading
+import time
+
+from chatbot_core import Chatbot
+from config import Config
+from fake_database import FakeDatabaseManager
+
+
+class _BrokenSchemaDatabase(FakeDatabaseManager):
+    """Connects, then fails loading the schema (slowly, with ``delay``)"""
+
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.delay = delay
+        self.connects = 0
+        self.closed = 0
+
+    def connect(self):
+        self.connects += 1
+        return super().connect()
+
+    def get_schema(self, tables=None):
+        time.sleep(self.delay)
+        raise RuntimeError("information_schema unavailable")
+
+    def close(self):
+        self.closed += 1
+        super().close()
+
+
+def test_initializes_once(chatbot):
+    assert chatbot.is_ready
+    assert chatbot.initialize()
+    assert chatbot.ensure_initialized()
+
+
+def test_failed_initialization(monkeypatch):
+    monkeypatch.setattr(Config, 'INIT_RETRY_INTERVAL', 60)
+    db = _BrokenSchemaDatabase()
+    bot = Chatbot(db=db)
+    assert not bot.initialize()
+    assert bot.state == 'failed'
+    assert db.closed == 1
+    # Retries are throttled: the next message does not reconnect
+    response = bot.process_message("show all employees")
+    assert not response['success']
+    assert db.connects == 1
+
+
+def test_requests_queued_behind_a_failed_start_do_not_retry(monkeypatch):
+    monkeypatch.setattr(Config, 'INIT_RETRY_INTERVAL', 60)
+    db = _BrokenSchemaDatabase(delay=0.2)
+    bot = Chatbot(db=db)
+    bot.start_warmup()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(bot.ensure_initialized()))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [False] * 5
+    assert db.connects == 1
+
+
+def test_retries_after_the_interval(monkeypatch):
+    monkeypatch.setattr(Config, 'INIT_RETRY_INTERVAL', 0.05)
+    db = _BrokenSchemaDatabase()
+    bot = Chatbot(db=db)
+    assert not bot.ensure_initialized()
+    time.sleep(0.1)
+    assert not bot.ensure_initialized()
+    assert db.connects == 2
@@ -0,0 +1,61 @@
+import pytest
+
+from metrics import COUNT_BUCKETS, Histogram, MetricsRegistry
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(COUNT_BUCKETS)
+    for value in range(1, 101):
+        histogram.observe(value)
+    assert histogram.count == 100 and histogram.sum == 5050
+    assert 40 <= histogram.quantile(0.5) <= 64
+    assert histogram.quantile(0.99) <= 100
+    assert histogram.quantile(0) == 1
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_render_summary_counter_and_gauges():
+    registry = MetricsRegistry()
+    registry.observe('latency_seconds', 0.5, 'Request latency', stage='total')
+    registry.inc('requests_total', help_text='Requests', outcome='success')
+    registry.inc('requests_total', outcome='success')
+    registry.gauge('pool', lambda: {(('state', 'idle'),): 3}, 'Pool state')
+    registry.gauge('cache_entries', lambda: 7)
+    registry.gauge('skipped', lambda: None)
+    registry.gauge('broken', lambda: 1 / 0)
+
+    lines = registry.render().splitlines()
+    assert '# HELP latency_seconds Request latency' in lines
+    assert '# TYPE latency_seconds summary' in lines
+    assert 'latency_seconds{stage="total",quantile="0.5"} 0.5' in lines
+    assert 'latency_seconds_count{stage="total"} 1' in lines
+    assert '# TYPE requests_total counter' in lines
+    assert 'requests_total{outcome="success"} 2' in lines
+    assert 'pool{state="idle"} 3' in lines
+    assert 'cache_entries 7' in lines
+    assert not any('skipped' in line or 'broken' in line for line in lines)
+
+
+def test_timer_records_milliseconds():
+    registry = MetricsRegistry()
+    timings = {}
+    with registry.timer('stage_seconds', timings, stage='parse'):
+        pass
+    assert set(timings) == {'parse'}
+    assert registry.quantile('stage_seconds', 0.5, stage='parse') >= 0
+    with pytest.raises(ValueError):
+        with registry.timer('stage_seconds', stage='parse'):
+            raise ValueError
+    assert registry._histograms[('stage_seconds', (('stage', 'parse'),))].count == 2
+
+
+def test_chatbot_stages_are_timed(chatbot):
+    response = chatbot.process_message("show all products", include_timings=True)
+    timings = response['debug']['timings_ms']
+    assert {'preprocess', 'intent', 'entities', 'generate_sql', 'execute',
+            'format'} <= set(timings)
+    text = chatbot.metrics.render()
+    assert 'chatbot_stage_seconds_count{stage="execute"} 1' in text
+    assert 'chatbot_requests_total{outcome="success"} 1' in text
+    assert 'chatbot_db_pool_connections{state="idle"}' in text
+    assert 'timings_ms' not in chatbot.process_message("show all orders")['debug']
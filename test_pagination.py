@@ -0,0 +1,57 @@
+import pytest
+
+from config import Config
+
+
+def test_pages_cover_every_row_once(chatbot):
+    ids = []
+    cursor = None
+    while True:
+        response = chatbot.process_message("show all employees", page_size=70, cursor=cursor)
+        assert response['success']
+        ids.extend(row['id'] for row in response['data'])
+        cursor = response['page']['next_cursor']
+        if not response['page']['has_more']:
+            break
+    assert ids == list(range(1, 201))
+    assert cursor is None
+
+
+def test_cursor_of_another_question_is_rejected(chatbot):
+    first = chatbot.process_message("show all employees", page_size=10)
+    response = chatbot.process_message("show all products",
+                                       cursor=first['page']['next_cursor'])
+    assert not response['success']
+    assert 'does not belong' in response['message']
+
+
+@pytest.mark.parametrize('page_size, expected', [
+    (-5, 1), (0, None), ('7', 7), ('abc', 100), (2.5, 2), (5000, 1000)
+])
+def test_page_size_is_validated(chatbot, page_size, expected):
+    response = chatbot.process_message("show all employees", page_size=page_size)
+    assert response['success']
+    if expected is None:
+        assert 'page' not in response
+    else:
+        assert response['page']['size'] == expected
+        assert response['count'] == min(expected, 200)
+
+
+@pytest.mark.parametrize('batch_size, expected', [
+    (None, 500), (-1, 1), ('abc', 500), ('20', 20), (10 ** 9, 5000)
+])
+def test_stream_batch_size_is_validated(chatbot, monkeypatch, batch_size, expected):
+    sizes = []
+    stream_query = chatbot.db.stream_query
+
+    def recording(query, params=None, batch_size=500, deadline=None):
+        sizes.append(batch_size)
+        return stream_query(query, params, batch_size, deadline)
+
+    monkeypatch.setattr(Config, 'STREAM_BATCH_SIZE', 500)
+    monkeypatch.setattr(Config, 'STREAM_MAX_BATCH_SIZE', 5000)
+    monkeypatch.setattr(chatbot.db, 'stream_query', recording)
+    records = list(chatbot.stream_message("show all employees", batch_size=batch_size))
+    assert sizes == [expected]
+    assert records[-1] == {'done': True, 'success': True, 'count': 200}
@@ -0,0 +1,28 @@
+from query_generator import QueryGenerator
+
+
+def test_values_are_bound_not_interpolated(chatbot):
+    response = chatbot.process_message("products where category is 'electronics'")
+    assert response['success']
+    assert 'electronics' not in response['sql']
+    assert response['params'][0] == 'electronics'
+    assert all(row['category'] == 'electronics' for row in response['data'])
+
+
+def test_injection_never_reaches_the_sql(chatbot):
+    response = chatbot.process_message(
+        "products where category = robert'); DROP TABLE products;--")
+    assert 'DROP' not in response['sql'] and "'" not in response['sql']
+    assert chatbot.process_message("how many products")['data'] == [{'count': 200}]
+
+
+def test_identifiers_are_backtick_quoted():
+    assert QueryGenerator.quote_identifier('name') == '`name`'
+    assert QueryGenerator.quote_identifier('a`b') == '`a``b`'
+
+
+def test_numeric_filter_is_bound(chatbot):
+    response = chatbot.process_message("employees with salary over 100000")
+    assert response['success']
+    assert '%s' in response['sql'] and 100000 in response['params']
+    assert all(row['salary'] > 100000 for row in response['data'])
@@ -0,0 +1,44 @@
+import copy
+
+import pytest
+
+from plan_cache import PlanCache, freeze
+
+
+def test_plan_cache_serves_near_identical_questions(chatbot):
+    assert not chatbot.process_message("Show all products")['debug']['plan_cached']
+    assert chatbot.process_message("show   ALL products")['debug']['plan_cached']
+
+
+def test_cached_plans_are_read_only(chatbot):
+    chatbot.process_message("show all products")
+    plan = chatbot.plan_message("show all products")
+    with pytest.raises(TypeError):
+        plan['entities']['table'] = 'orders'
+
+
+def test_schema_change_misses(chatbot):
+    chatbot.process_message("show all products")
+    products = chatbot.db.get_schema()['products']
+    chatbot.pattern_matcher.apply_schema_changes({'products': products})
+    assert not chatbot.process_message("show all products")['debug']['plan_cached']
+
+
+def test_lru_and_versions():
+    cache = PlanCache(max_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, 1, {'sql': key})
+    assert cache.get('a', 1) is None
+    assert cache.get('c', 1) == {'sql': 'c'}
+    assert cache.get('c', 2) is None
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 2}
+
+
+def test_freeze_and_thaw():
+    plan = freeze({'entities': {'filters': [['a', '=', 1]]}})
+    assert plan['entities']['filters'] == (('a', '=', 1),)
+    with pytest.raises(TypeError):
+        plan['entities'].update(table='x')
+    thawed = copy.deepcopy(plan)
+    thawed['entities']['table'] = 'x'
+    assert 'table' not in plan['entities']
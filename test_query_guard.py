@@ -0,0 +1,78 @@
+import threading
+import time
+
+from chatbot_core import Chatbot
+from config import Config
+from fake_database import FakeDatabaseManager
+
+
+def _count_explains(chatbot, monkeypatch, estimates=None):
+    """Record the thread of every EXPLAIN; answer from ``estimates`` in turn
+    when given"""
+    threads = []
+    explain_rows = chatbot.db.explain_rows
+
+    def recording(*args, **kwargs):
+        threads.append(threading.current_thread().name)
+        if estimates:
+            return estimates.pop(0)
+        return explain_rows(*args, **kwargs)
+
+    monkeypatch.setattr(chatbot.db, 'explain_rows', recording)
+    return threads
+
+
+def test_scan_over_budget_is_rejected(chatbot, monkeypatch):
+    monkeypatch.setattr(Config, 'EXPLAIN_ROW_BUDGET', 10)
+    response = chatbot.process_message("employees with salary over 5")
+    assert not response['success']
+    assert response['needs_narrowing']
+    assert response['estimated_rows'] > 10
+
+
+def test_estimate_is_cached_with_the_plan(chatbot, monkeypatch):
+    monkeypatch.setattr(Config, 'EXPLAIN_ROW_BUDGET', 10)
+    calls = _count_explains(chatbot, monkeypatch)
+    for _ in range(3):
+        assert chatbot.process_message("employees with salary over 5")['needs_narrowing']
+    assert len(calls) == 1
+
+
+def test_guard_checks_streams_and_batches(chatbot, monkeypatch):
+    monkeypatch.setattr(Config, 'EXPLAIN_ROW_BUDGET', 10)
+    header = next(chatbot.stream_message("employees with salary over 5"))
+    assert header.get('needs_narrowing')
+    batch = chatbot.process_messages(["employees with salary over 5", "how many employees"])
+    assert batch[0].get('needs_narrowing')
+    assert batch[1]['success']
+
+
+def test_estimate_is_refreshed_after_its_ttl(chatbot, monkeypatch):
+    monkeypatch.setattr(Config, 'EXPLAIN_ROW_BUDGET', 100)
+    monkeypatch.setattr(Config, 'EXPLAIN_ESTIMATE_TTL', 0.05)
+    calls = _count_explains(chatbot, monkeypatch, estimates=[50, 5000])
+    question = "employees with salary over 5"
+    assert chatbot.process_message(question)['success']
+    assert chatbot.process_message(question)['success']
+    time.sleep(0.1)
+    # The table grew: the approved question is checked again and refused
+    assert chatbot.process_message(question)['needs_narrowing']
+    assert len(calls) == 2
+
+
+def test_batch_checks_costs_concurrently(monkeypatch):
+    bot = Chatbot(db=FakeDatabaseManager(latency=0.1))
+    assert bot.initialize()
+    try:
+        calls = _count_explains(bot, monkeypatch)
+        questions = [f"employees with salary over {n}" for n in (10, 20, 30, 40)]
+        start = time.perf_counter()
+        responses = bot.process_messages(questions, max_workers=4)
+        elapsed = time.perf_counter() - start
+    finally:
+        bot.close()
+    assert all(r['success'] for r in responses)
+    assert len(calls) == 4
+    assert all(name.startswith('chatbot-batch') for name in calls)
+    # Four serial EXPLAIN + query round trips would take 0.8s
+    assert elapsed < 0.6
@@ -0,0 +1,73 @@
+import pytest
+
+from config import Config
+from conversation import is_refinement
+
+
+def test_refinement_in_memory(chatbot):
+    chatbot.process_message("show all employees", session_id='s')
+    queries = chatbot.db.queries
+    response = chatbot.process_message("only those in sales", session_id='s')
+    assert response['success'] and response['debug']['refined']
+    assert response['data'] and all(row['department'] == 'sales' for row in response['data'])
+    assert chatbot.db.queries == queries
+
+
+def test_refinement_by_query_is_guarded(chatbot, monkeypatch):
+    monkeypatch.setattr(Config, 'EXPLAIN_ROW_BUDGET', 10)
+    chatbot.process_message("how many employees", session_id='s')
+    response = chatbot.process_message("only those with salary over 1000", session_id='s')
+    assert not response['success']
+    assert response['needs_narrowing']
+
+
+def test_refinement_needs_a_session(chatbot):
+    chatbot.process_message("show all employees")
+    response = chatbot.process_message("only those in sales")
+    assert not response.get('debug', {}).get('refined')
+
+
+def _sales(chatbot):
+    rows = chatbot.process_message("show all employees")['data']
+    return [row for row in rows if row['department'] == 'sales']
+
+
+def test_count_follow_up(chatbot):
+    sales = _sales(chatbot)
+    chatbot.process_message("show all employees", session_id='s')
+    response = chatbot.process_message("how many of them are in sales", session_id='s')
+    assert response['success'] and response['debug']['refined']
+    assert response['debug']['intent'] == 'count'
+    assert response['data'] == [{'count': len(sales)}]
+
+
+def test_average_follow_up(chatbot):
+    sales = _sales(chatbot)
+    chatbot.process_message("show all employees", session_id='s')
+    response = chatbot.process_message(
+        "what is the average salary of those in sales", session_id='s')
+    assert response['success'] and response['debug']['refined']
+    assert response['debug']['intent'] == 'aggregate'
+    [row] = response['data']
+    average = sum(row['salary'] for row in sales) / len(sales)
+    assert float(row['avg_salary']) == pytest.approx(average)
+
+
+def test_count_follow_up_keeps_previous_filters(chatbot):
+    chatbot.process_message("show all employees", session_id='s')
+    sales = chatbot.process_message("only those in sales", session_id='s')['count']
+    response = chatbot.process_message("how many of them", session_id='s')
+    assert response['debug']['refined']
+    assert response['data'] == [{'count': sales}]
+
+
+@pytest.mark.parametrize('text, refines', [
+    ("only those in sales", True),
+    ("just electronics", True),
+    ("which of them earn over 50000", True),
+    ("which products cost over 100", False),
+    ("with salary over 5", False),
+    ("how many orders", False),
+])
+def test_refinement_cues(text, refines):
+    assert is_refinement(text) is refines
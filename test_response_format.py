@@ -0,0 +1,59 @@
+import gzip
+import json
+
+import pytest
+
+import response_format
+from response_format import (JSON_TYPE, MSGPACK_TYPE, compress, encode, negotiate, shape,
+                             shape_options, to_columnar)
+
+
+def test_negotiate_defaults_to_json():
+    assert negotiate(None, None) == (JSON_TYPE, None)
+    assert negotiate('text/html', 'identity')[0] == JSON_TYPE
+    assert negotiate(JSON_TYPE, 'gzip') == (JSON_TYPE, 'gzip')
+
+
+def test_shape_columnar_and_debug(chatbot):
+    response = chatbot.process_message("show all products")
+    data_format, debug = shape_options({'format': 'columnar'})
+    shaped = shape(response, data_format, debug)
+    assert 'debug' not in shaped
+    assert shaped['data']['columns'][0] == 'id'
+    assert len(shaped['data']['rows']) == response['count']
+    assert shape_options({'format': 'bogus', 'debug': 1}) == ('rows', True)
+
+
+def test_compress_skips_small_bodies():
+    body = json.dumps({'rows': list(range(1000))}).encode('utf-8')
+    compressed, applied = compress(body, 'gzip', min_bytes=1024)
+    assert applied == 'gzip'
+    assert gzip.decompress(compressed) == body
+    assert compress(b'{}', 'gzip', min_bytes=1024) == (b'{}', None)
+
+
+def test_stream_debug_only_when_asked(chatbot):
+    assert 'debug' not in next(chatbot.stream_message("show all orders"))
+    assert 'debug' in next(chatbot.stream_message("show all orders", debug=True))
+
+
+def test_negotiate_honours_q_values():
+    assert negotiate(JSON_TYPE, 'gzip;q=0') == (JSON_TYPE, None)
+    assert negotiate('*/*', 'deflate, gzip;q=0.5')[1] == 'gzip'
+
+
+def test_to_columnar_without_rows():
+    assert to_columnar([]) == {'columns': [], 'rows': []}
+    assert shape({'data': None}, 'columnar') == {'data': None}
+
+
+def test_msgpack_falls_back_to_json(monkeypatch):
+    monkeypatch.setattr(response_format, 'msgpack', None)
+    assert negotiate(MSGPACK_TYPE, None)[0] == JSON_TYPE
+    assert encode({'a': 1}, MSGPACK_TYPE, json.dumps) == b'{"a": 1}'
+
+
+def test_msgpack_round_trip():
+    msgpack = pytest.importorskip('msgpack')
+    body = encode({'rows': [[1, 'a']]}, MSGPACK_TYPE, json.dumps)
+    assert msgpack.unpackb(body) == {'rows': [[1, 'a']]}
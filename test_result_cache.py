@@ -0,0 +1,51 @@
+from result_cache import ResultCache, normalize_sql, tables_in
+
+
+def test_result_cache_serves_repeats(chatbot):
+    first = chatbot.process_message("show all products")
+    queries = chatbot.db.queries
+    second = chatbot.process_message("show all products")
+    assert not first['debug']['cached']
+    assert second['debug']['cached']
+    assert chatbot.db.queries == queries
+    assert second['data'] == first['data']
+
+
+def test_invalidating_a_table_requeries(chatbot):
+    chatbot.process_message("show all products")
+    queries = chatbot.db.queries
+    assert chatbot.invalidate_table('products') == 1
+    assert not chatbot.process_message("show all products")['debug']['cached']
+    assert chatbot.db.queries > queries
+
+
+def test_key_ignores_whitespace_but_not_params():
+    cache = ResultCache()
+    cache.put("SELECT *  FROM `t`\n WHERE a = %s;", [1], [{'a': 1}])
+    assert cache.get("SELECT * FROM `t` WHERE a = %s", [1]) == (True, [{'a': 1}])
+    assert cache.get("SELECT * FROM `t` WHERE a = %s", [2]) == (False, None)
+    assert normalize_sql("SELECT 'a  b'  FROM t;") == "SELECT 'a  b' FROM t"
+    assert tables_in("SELECT * FROM `orders` JOIN customers") == {'orders', 'customers'}
+
+
+def test_ttls_and_lru_eviction(monkeypatch):
+    cache = ResultCache(max_entries=2, default_ttl=30, table_ttls={'Live': 0})
+    assert not cache.put("SELECT * FROM live", [], [])
+    for table in ('a', 'b', 'c'):
+        assert cache.put(f"SELECT * FROM {table}", [], [{'x': 1}])
+    assert not cache.get("SELECT * FROM a")[0]
+    assert cache.stats()['evictions'] == 1
+
+    clock = [1000.0]
+    monkeypatch.setattr('result_cache.time.monotonic', lambda: clock[0])
+    cache.put("SELECT * FROM b", [], [])
+    clock[0] += 31
+    assert not cache.get("SELECT * FROM b")[0]
+
+
+def test_invalidate_table_drops_only_its_entries():
+    cache = ResultCache()
+    cache.put("SELECT * FROM orders JOIN customers", [], [])
+    cache.put("SELECT * FROM products", [], [])
+    assert cache.invalidate_table('Customers') == 1
+    assert cache.stats()['entries'] == 1
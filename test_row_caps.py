@@ -0,0 +1,25 @@
+from config import Config
+
+
+def test_row_cap_truncates(chatbot, monkeypatch):
+    monkeypatch.setattr(Config, 'MAX_ROWS', 25)
+    response = chatbot.process_message("show all employees")
+    assert response['success']
+    assert response['count'] == 25
+    assert response['truncated'] is True
+    assert 'Showing the first 25' in response['message']
+
+
+def test_row_cap_not_hit(chatbot, monkeypatch):
+    monkeypatch.setattr(Config, 'MAX_ROWS', 500)
+    response = chatbot.process_message("show all employees")
+    assert response['count'] == 200
+    assert response['truncated'] is False
+
+
+def test_per_table_cap(chatbot, monkeypatch):
+    monkeypatch.setattr(Config, 'MAX_ROWS', 500)
+    monkeypatch.setattr(Config, 'TABLE_ROW_CAPS', {'employees': '10'})
+    assert chatbot.process_message("show all employees")['count'] == 10
+    assert chatbot.process_message("show all products")['count'] == 200
+    assert chatbot.process_message("top 50 employees by salary")['count'] == 10
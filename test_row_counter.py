@@ -0,0 +1,124 @@
+import time
+
+import pytest
+
+from chatbot_core import Chatbot
+from config import Config
+from fake_database import FakeDatabaseManager
+from row_counter import RowCounter
+
+
+class _CountingDatabase(FakeDatabaseManager):
+    def __init__(self):
+        super().__init__()
+        self.counts = 0
+        self.estimates = 0
+
+    def execute_query(self, query, params=None, deadline=None):
+        if query.startswith('SELECT COUNT(*)'):
+            self.counts += 1
+        return super().execute_query(query, params, deadline)
+
+    def estimate_row_count(self, table_name):
+        self.estimates += 1
+        return super().estimate_row_count(table_name)
+
+
+@pytest.fixture
+def db():
+    db = _CountingDatabase()
+    db.connect()
+    yield db
+    db.close()
+
+
+def _wait_for(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_exact_counts_every_time(db):
+    counter = RowCounter(db)
+    assert counter.count('employees', 'exact') == (200, {'accuracy': 'exact', 'age': 0.0})
+    counter.count('employees', 'exact')
+    assert db.counts == 2
+
+
+def test_cached_counts_within_ttl(db):
+    counter = RowCounter(db, ttl=60, refresh_interval=0)
+    counter.count('employees', 'cached')
+    count, info = counter.count('employees', 'cached')
+    assert count == 200 and info['accuracy'] == 'exact'
+    assert db.counts == 1
+
+
+def test_cached_count_expires(db):
+    counter = RowCounter(db, ttl=0.05, refresh_interval=0)
+    counter.count('employees', 'cached')
+    time.sleep(0.1)
+    counter.count('employees', 'cached')
+    assert db.counts == 2
+
+
+def test_estimate_needs_no_scan(db):
+    counter = RowCounter(db, ttl=60)
+    count, info = counter.count('products', 'estimate')
+    assert count == 200 and info['accuracy'] == 'estimated'
+    counter.count('products', 'estimate')
+    assert db.counts == 0 and db.estimates == 1
+
+
+def test_unknown_table(db):
+    assert RowCounter(db).count('nope', 'estimate') is None
+
+
+def test_invalidate_forgets_counts(db):
+    counter = RowCounter(db, refresh_interval=0)
+    counter.count('employees', 'cached')
+    counter.invalidate('employees')
+    counter.count('employees', 'cached')
+    assert db.counts == 2
+    assert counter.stats() == {'cached': 1, 'hot': 0}
+
+
+def test_hot_tables_are_refreshed_in_the_background(db):
+    counter = RowCounter(db, ttl=60, hot_threshold=2, refresh_interval=0.02)
+    try:
+        counter.count('orders', 'cached')
+        counter.count('orders', 'cached')
+        assert counter.hot_tables() == ['orders']
+        assert _wait_for(lambda: db.counts >= 2)
+    finally:
+        counter.close()
+
+
+def test_refresher_restarts_after_close(db):
+    counter = RowCounter(db, ttl=60, hot_threshold=1, refresh_interval=0.02)
+    counter.count('orders', 'cached')
+    counter.close()
+    time.sleep(0.05)
+    counts = db.counts
+    counter.count('orders', 'cached')
+    try:
+        assert _wait_for(lambda: db.counts > counts + 1)
+    finally:
+        counter.close()
+
+
+def test_chatbot_restart_keeps_counts_refreshed(monkeypatch):
+    monkeypatch.setattr(Config, 'COUNT_HOT_THRESHOLD', 1)
+    monkeypatch.setattr(Config, 'COUNT_REFRESH_INTERVAL', 0.02)
+    db = _CountingDatabase()
+    bot = Chatbot(db=db)
+    assert bot.initialize()
+    bot.process_message("how many orders")
+    bot.close()
+    assert bot.initialize()
+    try:
+        bot.process_message("how many orders", count_accuracy='cached')
+        counts = db.counts
+        assert _wait_for(lambda: db.counts > counts)
+    finally:
+        bot.close()
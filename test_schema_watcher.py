@@ -0,0 +1,81 @@
+import time
+
+from schema_watcher import SchemaWatcher
+
+
+def _column(name, kind='int', key=''):
+    return {'name': name, 'type': kind, 'data_type': kind.split('(')[0], 'key': key,
+            'indexed': key in ('PRI', 'MUL', 'UNI')}
+
+
+def _add_table(db, table, columns):
+    """A migration creating ``table``, as the fake serves it"""
+    db._conn.execute(f"CREATE TABLE `{table}` ({', '.join(c['name'] for c in columns)})")
+    db._schema[table] = columns
+
+
+def _watcher(chatbot):
+    watcher = chatbot.schema_watcher
+    assert watcher.check() == []
+    return watcher
+
+
+def test_added_table(chatbot):
+    watcher = _watcher(chatbot)
+    version = chatbot.pattern_matcher.schema_version
+    _add_table(chatbot.db, 'suppliers',
+               [_column('id', key='PRI'), _column('name', 'varchar(100)')])
+    assert watcher.check() == ['suppliers']
+    assert chatbot.pattern_matcher.schema_version == version + 1
+    assert chatbot.plan_message("show all suppliers")['entities']['table'] == 'suppliers'
+    assert watcher.check() == []
+
+
+def test_dropped_table(chatbot):
+    watcher = _watcher(chatbot)
+    del chatbot.db._schema['orders']
+    assert watcher.check() == ['orders']
+    assert 'orders' not in chatbot.pattern_matcher.schema
+    assert chatbot.plan_message("show all orders")['entities']['table'] != 'orders'
+
+
+def test_altered_table_only_rebuilds_that_table(chatbot):
+    watcher = _watcher(chatbot)
+    employees = chatbot.pattern_matcher.column_indexes['employees']
+    chatbot.process_message("show all products")
+    chatbot.db._schema['products'].append(_column('discount', 'decimal(5,2)'))
+    assert watcher.check() == ['products']
+    assert 'discount' in chatbot.pattern_matcher.column_mappings['products']
+    assert chatbot.pattern_matcher.column_indexes['employees'] is employees
+    # The changed table's cached results are dropped
+    assert not chatbot.process_message("show all products")['debug']['cached']
+
+
+def test_first_check_catches_up_with_a_stale_load(chatbot):
+    chatbot.db._schema['employees'].append(_column('bonus'))
+    watcher = SchemaWatcher(chatbot.db, chatbot.pattern_matcher)
+    assert watcher.check() == ['employees']
+
+
+def test_unreadable_fingerprints_change_nothing(chatbot, monkeypatch):
+    watcher = _watcher(chatbot)
+    monkeypatch.setattr(chatbot.db, 'schema_fingerprints', lambda: None)
+    del chatbot.db._schema['orders']
+    assert watcher.check() == []
+    assert 'orders' in chatbot.pattern_matcher.schema
+
+
+def test_polls_in_the_background(chatbot):
+    changed = []
+    watcher = SchemaWatcher(chatbot.db, chatbot.pattern_matcher, interval=0.01,
+                            on_change=changed.extend)
+    watcher.start()
+    try:
+        _add_table(chatbot.db, 'suppliers', [_column('id', key='PRI')])
+        for _ in range(200):
+            if changed:
+                break
+            time.sleep(0.01)
+        assert changed == ['suppliers']
+    finally:
+        watcher.stop()
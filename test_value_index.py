@@ -0,0 +1,102 @@
+import pytest
+
+from fake_database import FakeDatabaseManager
+from value_index import ValueIndex
+
+
+class _RecordingDatabase(FakeDatabaseManager):
+    def __init__(self):
+        super().__init__()
+        self.statements = []
+
+    def execute_query(self, query, params=None, deadline=None):
+        self.statements.append(query)
+        return super().execute_query(query, params, deadline)
+
+    def estimate_row_count(self, table_name):
+        self.statements.append(f'estimate {table_name}')
+        return super().estimate_row_count(table_name)
+
+    def estimate_row_counts(self, tables=None):
+        self.statements.append('estimate all')
+        return super().estimate_row_counts(tables)
+
+
+@pytest.fixture
+def db():
+    db = _RecordingDatabase()
+    db.connect()
+    yield db
+    db.close()
+
+
+def _without_key(schema, table, column):
+    """The schema with ``column`` of ``table`` unindexed, so its table's
+    row estimate is needed"""
+    schema = {t: [dict(col) for col in cols] for t, cols in schema.items()}
+    for col in schema[table]:
+        if col['name'] == column:
+            col['key'], col['indexed'] = '', False
+    return schema
+
+
+def test_finds_whole_words_longest_first():
+    index = ValueIndex({('products', 'category'): ['Home', 'Home Goods', 'c++'],
+                        ('orders', 'status'): ['pending']})
+    assert index.find("show home goods products") == [('products', 'category', 'Home Goods')]
+    assert index.find("homework") == []
+    assert index.find("c++ and pending") == [('products', 'category', 'c++'),
+                                             ('orders', 'status', 'pending')]
+    assert index.find("pending home", table='orders') == [('orders', 'status', 'pending')]
+
+
+def test_reserved_names_and_numbers_are_left_out():
+    index = ValueIndex({('orders', 'status'): ['orders', '42', 'shipped']},
+                       reserved={'orders'})
+    assert index.find("orders 42 shipped") == [('orders', 'status', 'shipped')]
+
+
+def test_build_reads_row_estimates_in_one_query(db):
+    schema = _without_key(db.get_schema(), 'products', 'category')
+    index = ValueIndex.build(db, schema, max_bytes=1024 * 1024)
+    assert ('products', 'category') in index.values
+    assert ('orders', 'status') in index.values
+    estimates = [s for s in db.statements if s.startswith('estimate')]
+    assert estimates == ['estimate all']
+
+
+def test_build_skips_large_unindexed_tables(db):
+    schema = _without_key(db.get_schema(), 'products', 'category')
+    index = ValueIndex.build(db, schema, max_bytes=1024 * 1024, scan_rows=100)
+    assert ('products', 'category') not in index.values
+
+
+def test_budget_counts_the_real_footprint(db):
+    full = ValueIndex.build(db, db.get_schema(), max_bytes=1024 * 1024)
+    raw = sum(len(str(v)) for values in full.values.values() for v in values)
+    assert full.size > raw
+    budget = full.size // 2
+    half = ValueIndex.build(db, db.get_schema(), max_bytes=budget)
+    assert 0 < half.size <= budget
+
+
+def test_refresh_reloads_only_changed_tables(db):
+    schema = db.get_schema()
+    previous = ValueIndex.build(db, schema, max_bytes=1024 * 1024)
+    db.statements.clear()
+    index = ValueIndex.build(db, schema, max_bytes=1024 * 1024,
+                             tables={'orders': schema['orders']}, previous=previous)
+    assert index.values == previous.values
+    scans = [s for s in db.statements if s.startswith('SELECT DISTINCT')]
+    assert scans and all('`orders`' in scan for scan in scans)
+
+
+def test_snapshot_round_trip(db):
+    schema = db.get_schema()
+    index = ValueIndex.build(db, schema, max_bytes=1024 * 1024)
+    entries = index.to_snapshot()
+    assert ValueIndex.from_snapshot(entries, schema, 1024 * 1024).values == index.values
+    del schema['orders']
+    restored = ValueIndex.from_snapshot(entries, schema, 1024 * 1024)
+    assert ('orders', 'status') not in restored.values
+    assert ValueIndex.from_snapshot(entries, schema, 0).values == {}
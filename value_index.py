@@ -0,0 +1,183 @@
+import sys
+from bisect import bisect_left, bisect_right
+
+from query_generator import QueryGenerator
+
+# Column types whose values a question may name directly ("electronics")
+TEXT_TYPES = frozenset({'char', 'varchar', 'enum', 'set'})
+
+# Bytes one indexed value costs beyond its two strings (as measured on
+# CPython): its (table, column, value) tuple, the list holding it and its
+# dict slot
+_ENTRY_OVERHEAD = 200
+
+
+def _normalize(value):
+    return ' '.join(str(value).lower().split())
+
+
+def _footprint(column_values):
+    """Bytes the values of one column take once indexed"""
+    size = 0
+    for value in column_values:
+        size += sys.getsizeof(value) + sys.getsizeof(_normalize(value)) + _ENTRY_OVERHEAD
+    return size
+
+
+def _reserved(schema):
+    """Table and column names (and their plurals), which values may not be"""
+    reserved = set()
+    for table, columns in schema.items():
+        for name in [table] + [col['name'] for col in columns]:
+            name = _normalize(name.replace('_', ' '))
+            reserved.update((name, name.rstrip('s'), f'{name}s'))
+    return reserved
+
+
+class ValueIndex:
+    """The distinct values of low-cardinality text columns, so a question
+    that names a value without its column ("show electronics products") can
+    still be filtered on that column.
+
+    ``values`` maps ``(table, column)`` to the column's distinct values.
+    Values are matched case-insensitively and as whole words; values that
+    are also a table or column name are left out, as they are ambiguous.
+    Lookup is one dict of normalized values, probed with the slices of the
+    question between word boundaries; ``size`` is its footprint in bytes.
+    """
+
+    def __init__(self, values=None, reserved=()):
+        self.values = values or {}
+        reserved = set(reserved)
+        self._lookup = {}
+        for (table, column), column_values in self.values.items():
+            for value in column_values:
+                key = _normalize(value)
+                if key and not key.isdigit() and key not in reserved:
+                    self._lookup.setdefault(key, []).append((table, column, value))
+        self._lengths = frozenset(len(key) for key in self._lookup)
+        self._longest = max(self._lengths, default=0)
+        self.footprints = {key: _footprint(column_values)
+                           for key, column_values in self.values.items()}
+        self.size = sum(self.footprints.values())
+
+    @classmethod
+    def build(cls, db, schema, max_bytes, max_distinct=100, scan_rows=100000,
+              tables=None, previous=None):
+        """Load the values of every eligible column of ``schema``.
+
+        A column is eligible when it is a text column without a unique key,
+        has at most ``max_distinct`` distinct values and leads an index or
+        belongs to a table of at most ``scan_rows`` estimated rows (so no
+        large table is scanned; the estimates of all tables are read in one
+        query). Columns are added until the index takes ``max_bytes``. With
+        ``tables`` only those tables are loaded again, the rest are kept
+        from ``previous``.
+        """
+        reserved = _reserved(schema)
+        if max_bytes <= 0:
+            return cls({}, reserved)
+
+        kept = {}
+        if previous is not None and tables is not None:
+            for (table, column), column_values in previous.values.items():
+                if table not in tables:
+                    kept.setdefault(table, []).append(
+                        (column, column_values, previous.footprints[(table, column)]))
+
+        values = {}
+        size = 0
+        estimates = None
+        for table, columns in schema.items():
+            if table in kept:
+                for column, column_values, column_size in kept[table]:
+                    if size + column_size <= max_bytes:
+                        values[(table, column)] = column_values
+                        size += column_size
+                continue
+            if tables is not None and previous is not None and table not in tables:
+                continue
+            candidates = [col for col in columns
+                          if col.get('data_type') in TEXT_TYPES
+                          and col.get('key') not in ('PRI', 'UNI')]
+            for col in candidates:
+                if not col.get('indexed'):
+                    if estimates is None:
+                        estimates = db.estimate_row_counts(tables) or {}
+                    estimate = estimates.get(table)
+                    if estimate is None or estimate > scan_rows:
+                        continue
+                column_values = cls._distinct_values(db, table, col['name'], max_distinct)
+                if column_values is None:
+                    continue
+                column_size = _footprint(column_values)
+                if size + column_size > max_bytes:
+                    continue
+                values[(table, col['name'])] = column_values
+                size += column_size
+        return cls(values, reserved)
+
+    @classmethod
+    def from_snapshot(cls, entries, schema, max_bytes):
+        """The index saved by ``to_snapshot``, without the columns no longer
+        in ``schema`` or beyond ``max_bytes``"""
+        values = {}
+        size = 0
+        if max_bytes > 0:
+            for table, column, column_values in entries:
+                if not any(col['name'] == column for col in schema.get(table, ())):
+                    continue
+                column_size = _footprint(column_values)
+                if size + column_size > max_bytes:
+                    continue
+                values[(table, column)] = column_values
+                size += column_size
+        return cls(values, _reserved(schema))
+
+    def to_snapshot(self):
+        """The loaded values as JSON-ready ``[table, column, values]`` lists"""
+        return [[table, column, list(column_values)]
+                for (table, column), column_values in self.values.items()]
+
+    @staticmethod
+    def _distinct_values(db, table, column, max_distinct):
+        """The column's distinct values, or None if it has more than
+        ``max_distinct`` of them"""
+        quoted = QueryGenerator.quote_identifier(column)
+        results = db.execute_query(
+            f"SELECT DISTINCT {quoted} AS value FROM {QueryGenerator.quote_identifier(table)} "
+            f"WHERE {quoted} IS NOT NULL LIMIT %s",
+            [max_distinct + 1])
+        if results is None or len(results) > max_distinct:
+            return None
+        return [row['value'] for row in results]
+
+    def find(self, text, table=None):
+        """The values named in ``text`` as ``(table, column, value)``, in
+        order of appearance; overlapping names resolve to the longest"""
+        if not self._lookup:
+            return []
+        text = _normalize(text)
+        # A value starts after a non-alphanumeric character and ends before one
+        starts = [i for i in range(len(text))
+                  if text[i] != ' ' and (i == 0 or not text[i - 1].isalnum())]
+        ends = [i for i in range(1, len(text) + 1)
+                if text[i - 1] != ' ' and (i == len(text) or not text[i].isalnum())]
+
+        matches = []
+        taken = 0
+        for start in starts:
+            if start < taken:
+                continue
+            first = bisect_right(ends, start)
+            last = bisect_left(ends, start + self._longest + 1)
+            for end in reversed(ends[first:last]):
+                if end - start not in self._lengths:
+                    continue
+                entries = [entry for entry in self._lookup.get(text[start:end], ())
+                           if table is None or entry[0] == table]
+                if entries:
+                    matches.extend(entries)
+                    taken = end
+                    break
+        return matches